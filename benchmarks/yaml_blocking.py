@@ -0,0 +1,93 @@
+"""
+Measure how long saving a large YAML note blocks the event loop.
+
+Compares the previous path (pure-Python `yaml.safe_dump` on the loop
+thread) with `FormatOutput`, which uses libyaml when available and
+renders large notes in a worker thread.
+
+    python benchmarks/yaml_blocking.py [--size 1000000] [--rounds 5]
+"""
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import aiofiles
+import yaml
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from note_core import NoteResponse, note_fields
+from note_core._config import OutputFormat
+from note_core._format_out import FormatOutput
+from note_core import _yaml_backend
+
+async def monitor(stop: asyncio.Event, interval: float = 0.001) -> float:
+    """
+    Return the longest delay between two ticks that should be `interval` apart.
+    """
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        worst = max(worst, now - last - interval)
+        last = now
+    return worst
+
+async def measure(save) -> tuple[float, float]:
+    stop = asyncio.Event()
+    task = asyncio.create_task(monitor(stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await save()
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.01)
+    stop.set()
+    return elapsed, await task
+
+def make_response(size: int) -> NoteResponse:
+    line = "The quick brown fox jumps over the lazy dog. 敏捷的棕色狐狸跳过了懒狗。\n"
+    text = line * (size // len(line) // 2 + 1)
+    return NoteResponse.model_validate(
+        {
+            "id": "benchmark",
+            "model_id": "benchmark",
+            "context": {
+                "context_list": [
+                    {"role": "user", "content": text},
+                    {"role": "assistant", "content": text},
+                ]
+            },
+        }
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type = int, default = 1_000_000, help = "Note size in characters")
+    parser.add_argument("--rounds", type = int, default = 5)
+    args = parser.parse_args()
+
+    response = make_response(args.size)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "note.yaml"
+
+        async def before():
+            fields = note_fields(response, datetime.now())
+            async with aiofiles.open(path, "w", encoding = "utf-8") as f:
+                await f.write(yaml.safe_dump(fields))
+
+        async def after():
+            await FormatOutput(OutputFormat.YAML, path).output(response)
+
+        print(f"libyaml: {_yaml_backend.HAS_LIBYAML}, note size: {args.size} chars")
+        for name, save in (("before", before), ("after", after)):
+            results = [await measure(save) for _ in range(args.rounds)]
+            elapsed = min(r[0] for r in results)
+            blocked = max(r[1] for r in results)
+            print(f"{name:>6}: save {elapsed * 1000:8.1f} ms, max loop block {blocked * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
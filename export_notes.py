@@ -0,0 +1,104 @@
+"""
+Export note files from an output directory, decompressing them if needed.
+Notes already rolled into archive/*.tar* are read through their index.
+
+    python export_notes.py ./output/repeater ./export --since 2025-01-01
+    python export_notes.py ./output/repeater --stdout --since 2025-01-01 --until 2025-01-02
+"""
+import sys
+import shutil
+import argparse
+from pathlib import Path
+from typing import Iterator
+from note_core._compression import decompress, detect, open_note, strip_suffix
+from note_core._dedup import MANIFEST_SUFFIX, restore_note, restored_name
+from note_core._archiver import DAY_DIR, iter_archived, list_archives, read_index
+
+def iter_notes(output_dir: Path, since: str | None = None, until: str | None = None) -> Iterator[tuple[Path, bytes | None]]:
+    """
+    Notes of `output_dir` as `(path, data)`, oldest day first.
+
+    Notes in a day directory come with `data` None and are read from `path`.
+    Archived notes come with their content; `path` is where they were
+    before the day was archived.
+    """
+    day_dirs = {
+        path.name: path
+        for path in output_dir.iterdir()
+        if path.is_dir() and DAY_DIR.match(path.name)
+    }
+    archives: dict[str, list[Path]] = {}
+    for day, archive in list_archives(output_dir / "archive"):
+        archives.setdefault(day, []).append(archive)
+
+    for day in sorted(day_dirs.keys() | archives.keys()):
+        if since is not None and day < since:
+            continue
+        if until is not None and day >= until:
+            continue
+        seen: set[str] = set()
+        if day in day_dirs:
+            for path in sorted(day_dirs[day].iterdir()):
+                if path.is_file() and not path.name.startswith("."):
+                    seen.add(path.name)
+                    yield path, None
+        for archive in archives.get(day, []):
+            members = read_index(archive)
+            if members is None:
+                print(f"Skipping archive without a readable index: {archive}", file = sys.stderr)
+                continue
+            for name, data in iter_archived(archive, members):
+                path = output_dir / name
+                # 归档中断时文件可能同时留在日期目录中
+                if path.name not in seen:
+                    seen.add(path.name)
+                    yield path, data
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir", type = Path, help = "Note output directory (output_dir in the config)")
+    parser.add_argument("dest", type = Path, nargs = "?", help = "Directory to export decompressed notes to")
+    parser.add_argument("--stdout", action = "store_true", help = "Write notes to stdout instead")
+    parser.add_argument("--since", help = "First day to export, e.g. 2025-01-01")
+    parser.add_argument("--until", help = "Day to stop before (exclusive)")
+    args = parser.parse_args()
+
+    if args.dest is None and not args.stdout:
+        parser.error("either dest or --stdout is required")
+    if not args.output_dir.is_dir():
+        print(f"Output directory not found: {args.output_dir}", file = sys.stderr)
+        return 1
+
+    count = 0
+    for path, data in iter_notes(args.output_dir, args.since, args.until):
+        if path.name.endswith(MANIFEST_SUFFIX):
+            # 去重保存的笔记，从 blob 还原原始内容
+            note = restore_note(path, data = data)
+            target = args.dest / path.parent.relative_to(args.output_dir) / restored_name(path, data) if args.dest else None
+        elif data is not None:
+            note = decompress(data, detect(path))
+            target = args.dest / strip_suffix(path.relative_to(args.output_dir)) if args.dest else None
+        else:
+            with open_note(path) as src:
+                if args.stdout:
+                    shutil.copyfileobj(src, sys.stdout.buffer)
+                    sys.stdout.buffer.write(b"\n")
+                else:
+                    target = args.dest / strip_suffix(path.relative_to(args.output_dir))
+                    target.parent.mkdir(parents = True, exist_ok = True)
+                    with open(target, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+            count += 1
+            continue
+        if args.stdout:
+            sys.stdout.buffer.write(note + b"\n")
+        else:
+            target.parent.mkdir(parents = True, exist_ok = True)
+            target.write_bytes(note)
+        count += 1
+    if not args.stdout:
+        print(f"Exported {count} notes to {args.dest}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,31 @@
-from ._config import Config
+from ._config import Config, RuntimeConfig, Compression
 from ._config_loader import ConfigLoader
 from ._response import NoteResponse
+from ._formatters import register_formatter, get_formatter, note_fields
+from ._note_template import NoteTemplate, compile_template
+from ._segment_log import SegmentLog, segment_logs
+from ._sqlite_store import SqliteNoteStore, sqlite_stores
+from ._note_writer import NoteWriter, note_writer
+from ._outbox import Outbox, OutboxEntry, outboxes
+from ._compression import compress, decompress, open_note, read_note
+from ._archiver import Archiver
+from ._dedup import BlobStore, blob_stores, load_manifest, restore_note
 from ._main import NoteCore
-from ._timer import Timer
\ No newline at end of file
+from ._client_pool import ClientPool, client_pool
+from ._retry import RetryPolicy
+from ._userlist_cache import UserListCache, userlist_caches
+from ._userlist_stream import UserIdSnapshot, iter_json_string_array, reservoir_sample
+from ._limiter import ServerLimiter, TokenBucket, LimiterStats, server_limiters
+from ._circuit_breaker import CircuitBreaker, CircuitState, circuit_breakers
+from ._timer import Timer
+from ._scheduler import Scheduler, Job
+from ._run_planner import RunPlanner
+from ._load_profile import LoadProfile, load_profiles
+from ._prompt_store import Prompt, PromptStore, prompt_store
+from ._request_template import CompletionTemplate
+from ._config_files import find_config_file, scan_config_files
+from ._config_cache import ConfigCache
+from ._worker_manager import WorkerManager, Worker
+from ._config_watcher import ConfigWatcher
+from ._startup import StartupRamp
+from ._schedule_state import ScheduleState, ScheduleEntry
\ No newline at end of file
@@ -0,0 +1,303 @@
+import os
+import re
+import sys
+import asyncio
+import tarfile
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from loguru import logger
+from ._config import Compression
+from ._compression import SUFFIXES
+from ._atomic import atomic_write, temp_path
+from ._dedup import MANIFEST_SUFFIX, blob_stores, manifest_blobs
+
+DAY_DIR = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+ARCHIVE_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:\.\d+)?\.tar(?:\.gz|\.bz2|\.xz)?$")
+
+TAR_MODES: dict[Compression, str] = {
+    Compression.NONE: "w",
+    Compression.GZIP: "w:gz",
+    Compression.BZ2: "w:bz2",
+    Compression.LZMA: "w:xz",
+}
+
+def _lower_priority():
+    # 仅降低归档线程自身的优先级：只有 Linux 上 setpriority 作用于线程，
+    # 其他平台上会作用于整个进程
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, 19)
+    except (AttributeError, OSError):
+        pass
+
+class Archiver:
+    """
+    Rolls old day directories of note output into tar archives.
+
+    Each archived day becomes `archive/YYYY-MM-DD.tar[.gz|.bz2|.xz]` next
+    to a `.index.json` listing its members. Work runs on one low-priority
+    thread. After archiving, archives past `retention_days` or beyond
+    `max_bytes` in total are deleted, oldest first, and dedup blobs that no
+    manifest refers to any more are removed.
+    """
+
+    INDEX_SUFFIX = ".index.json"
+
+    def __init__(
+            self,
+            after_days: int = 30,
+            compression: Compression = Compression.GZIP,
+            retention_days: int | None = None,
+            max_bytes: int | None = None,
+            interval: float = 3600.0,
+        ):
+        self._after_days = after_days
+        self._compression = compression
+        self._retention_days = retention_days
+        self._max_bytes = max_bytes
+        self._interval = interval
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _archive_path(self, archive_dir: Path, day: str) -> Path:
+        suffix = SUFFIXES.get(self._compression, "")
+        path = archive_dir / f"{day}.tar{suffix}"
+        n = 1
+        while path.exists():
+            path = archive_dir / f"{day}.{n}.tar{suffix}"
+            n += 1
+        return path
+
+    def _indexed_members(self, archive_dir: Path, day: str) -> dict[str, int]:
+        """
+        Members already archived for `day`, mapped to their size.
+        """
+        members: dict[str, int] = {}
+        for index in archive_dir.glob(f"{day}*{self.INDEX_SUFFIX}"):
+            try:
+                data = orjson.loads(index.read_bytes())
+            except (OSError, orjson.JSONDecodeError):
+                continue
+            for name, member in data.get("members", {}).items():
+                members[name] = member["size"]
+        return members
+
+    def archive_day(self, day_dir: Path, archive_dir: Path) -> Path | None:
+        day = day_dir.name
+        archive_dir.mkdir(parents = True, exist_ok = True)
+        archived = self._indexed_members(archive_dir, day)
+        files: list[Path] = []
+        for path in sorted(day_dir.iterdir()):
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            name = f"{day}/{path.name}"
+            if archived.get(name) == path.stat().st_size:
+                # 上次归档后删除原文件前中断，已归档的文件直接删除
+                path.unlink()
+                continue
+            files.append(path)
+
+        archive = None
+        if files:
+            archive = self._archive_path(archive_dir, day)
+            tmp = temp_path(archive)
+            with tarfile.open(tmp, TAR_MODES[self._compression]) as tar:
+                for path in files:
+                    tar.add(path, arcname = f"{day}/{path.name}", recursive = False)
+            with open(tmp, "rb+") as f:
+                os.fsync(f.fileno())
+            members: dict[str, dict] = {}
+            with tarfile.open(tmp, "r:*") as tar:
+                for info in tar:
+                    # offset 为成员数据在未压缩 tar 流中的位置
+                    members[info.name] = {"size": info.size, "offset": info.offset_data, "mtime": info.mtime}
+            # 记录归档中的清单引用的 blob，清理 blob 时无需解压归档
+            blobs: set[str] = set()
+            for path in files:
+                if path.name.endswith(MANIFEST_SUFFIX):
+                    blobs |= manifest_blobs(path.read_bytes())
+            os.replace(tmp, archive)
+            # 索引最后写入：只有索引中的文件才会被视为已归档
+            atomic_write(
+                archive.with_name(archive.name + self.INDEX_SUFFIX),
+                orjson.dumps({"archive": archive.name, "members": members, "blobs": sorted(blobs)}),
+            )
+            for path in files:
+                path.unlink()
+            logger.info(f"Archived {len(files)} notes from {day_dir} to {archive}")
+
+        try:
+            day_dir.rmdir()
+        except OSError:
+            # 目录中仍有其他文件
+            pass
+        return archive
+
+    def enforce_retention(self, archive_dir: Path, today: date):
+        archives = list_archives(archive_dir)
+
+        def remove(path: Path):
+            path.unlink(missing_ok = True)
+            path.with_name(path.name + self.INDEX_SUFFIX).unlink(missing_ok = True)
+            logger.info(f"Removed archive {path}")
+
+        if self._retention_days is not None:
+            cutoff = (today - timedelta(days = self._retention_days)).isoformat()
+            while archives and archives[0][0] < cutoff:
+                remove(archives.pop(0)[1])
+        if self._max_bytes is not None:
+            sizes = [
+                path.stat().st_size + self._index_size(path)
+                for _, path in archives
+            ]
+            total = sum(sizes)
+            while archives and total > self._max_bytes:
+                total -= sizes.pop(0)
+                remove(archives.pop(0)[1])
+
+    def _index_size(self, archive: Path) -> int:
+        try:
+            return archive.with_name(archive.name + self.INDEX_SUFFIX).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def collect_blobs(self, output_dir: Path) -> int:
+        """
+        Delete dedup blobs of `output_dir` that no manifest, in a day
+        directory or an archive, refers to. Returns the number deleted.
+        """
+        blob_dir = output_dir / "blobs"
+        if not blob_dir.is_dir():
+            return 0
+        referenced: set[str] = set()
+        try:
+            for day_dir in output_dir.iterdir():
+                if day_dir.is_dir() and DAY_DIR.match(day_dir.name):
+                    for path in day_dir.glob(f"*{MANIFEST_SUFFIX}"):
+                        referenced |= manifest_blobs(path.read_bytes())
+            for _, archive in list_archives(output_dir / "archive"):
+                blobs = archived_blobs(archive)
+                if blobs is None:
+                    raise ValueError(f"unreadable index for {archive}")
+                referenced |= blobs
+        except Exception as e:
+            # 引用集合不完整时不删除任何 blob
+            logger.warning(f"Skipped blob cleanup for {output_dir}: {e}")
+            return 0
+        removed = blob_stores.get(blob_dir).sweep(referenced)
+        if removed:
+            logger.info(f"Removed {removed} unreferenced blobs from {blob_dir}")
+        return removed
+
+    def archive_output_dir(self, output_dir: Path, today: date | None = None):
+        """
+        Archive every day directory older than `after_days`, then apply
+        retention and remove unreferenced blobs.
+        """
+        today = today or date.today()
+        if not output_dir.is_dir():
+            return
+        archive_dir = output_dir / "archive"
+        cutoff = (today - timedelta(days = self._after_days)).isoformat()
+        for day_dir in sorted(output_dir.iterdir()):
+            if day_dir.is_dir() and DAY_DIR.match(day_dir.name) and day_dir.name < cutoff:
+                try:
+                    self.archive_day(day_dir, archive_dir)
+                except Exception as e:
+                    logger.error(f"Failed to archive {day_dir}: {e}")
+        self.enforce_retention(archive_dir, today)
+        self.collect_blobs(output_dir)
+
+    async def run_once(self, output_dirs: Iterable[Path]):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers = 1,
+                thread_name_prefix = "note-archiver",
+                initializer = _lower_priority,
+            )
+        loop = asyncio.get_running_loop()
+        for output_dir in sorted(set(output_dirs)):
+            await loop.run_in_executor(self._executor, self.archive_output_dir, output_dir)
+
+    async def run(self, output_dirs: Callable[[], Iterable[Path]]):
+        try:
+            while True:
+                try:
+                    await self.run_once(output_dirs())
+                except Exception as e:
+                    logger.opt(exception = e).error(f"Archiver failed: {e}")
+                await asyncio.sleep(self._interval)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait = False)
+                self._executor = None
+
+def list_archives(archive_dir: Path) -> list[tuple[str, Path]]:
+    """
+    `(day, archive)` pairs in `archive_dir`, oldest first.
+    """
+    if not archive_dir.is_dir():
+        return []
+    archives: list[tuple[str, Path]] = []
+    for path in archive_dir.iterdir():
+        match = ARCHIVE_NAME.match(path.name)
+        if match is not None:
+            archives.append((match.group(1), path))
+    # 同一天的多个归档按创建时间排序
+    archives.sort(key = lambda item: (item[0], item[1].stat().st_mtime_ns))
+    return archives
+
+def read_index(archive: Path) -> dict[str, dict] | None:
+    """
+    Members listed in the index of `archive`, or None if it has no readable index.
+    """
+    try:
+        data = orjson.loads(archive.with_name(archive.name + Archiver.INDEX_SUFFIX).read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    return data.get("members", {})
+
+def archived_blobs(archive: Path) -> set[str] | None:
+    """
+    Blobs referenced by the manifests in `archive`, or None if its index is unreadable.
+    """
+    try:
+        data = orjson.loads(archive.with_name(archive.name + Archiver.INDEX_SUFFIX).read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    if "blobs" in data:
+        return set(data["blobs"])
+    # 索引中没有 blob 列表时读取归档中的清单
+    members = {
+        name: member
+        for name, member in data.get("members", {}).items()
+        if name.endswith(MANIFEST_SUFFIX)
+    }
+    blobs: set[str] = set()
+    for _, content in iter_archived(archive, members):
+        blobs |= manifest_blobs(content)
+    return blobs
+
+def iter_archived(archive: Path, members: dict[str, dict] | None = None) -> Iterator[tuple[str, bytes]]:
+    """
+    Indexed members of `archive` as `(YYYY-MM-DD/name, data)`, in archive order.
+
+    Only members listed in the index are read, as only those count as archived.
+    """
+    members = read_index(archive) if members is None else members
+    if not members:
+        return
+    if archive.name.endswith(".tar"):
+        # 未压缩的归档按索引中的偏移直接读取
+        with open(archive, "rb") as f:
+            for name, member in sorted(members.items(), key = lambda item: item[1]["offset"]):
+                f.seek(member["offset"])
+                yield name, f.read(member["size"])
+        return
+    with tarfile.open(archive, "r|*") as tar:
+        for info in tar:
+            if info.name in members and info.isfile():
+                yield info.name, tar.extractfile(info).read()
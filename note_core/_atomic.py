@@ -0,0 +1,50 @@
+import os
+import threading
+from pathlib import Path
+
+def temp_path(path: Path) -> Path:
+    """
+    Hidden temp file next to `path`, unique per thread.
+    """
+    return path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+
+def write_temp(path: Path, data: bytes, fsync: bool = True) -> Path:
+    """
+    Write `data` to a temp file next to `path` and return the temp file.
+    """
+    path.parent.mkdir(parents = True, exist_ok = True)
+    tmp = temp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return tmp
+
+def fsync_dir(directory: Path):
+    # 让重命名本身落盘；部分平台不支持打开目录
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write(path: Path, data: bytes, fsync: bool = True):
+    """
+    Replace `path` with `data` through a temp file and a rename.
+
+    With `fsync`, both the file and the rename are flushed to disk.
+    """
+    tmp = write_temp(path, data, fsync = fsync)
+    try:
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok = True)
+        raise
+    if fsync:
+        fsync_dir(path.parent)
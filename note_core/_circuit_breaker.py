@@ -0,0 +1,83 @@
+import time
+from enum import StrEnum
+from loguru import logger
+from ._config import CircuitBreakerConfig
+from ._registry import ServerRegistry
+
+class CircuitState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Stops requests to a server after repeated failures.
+
+    After `recovery_timeout` seconds the breaker lets a few probe requests
+    through; a success closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, config: CircuitBreakerConfig, name: str = ""):
+        self._config = config
+        self._name = name
+        self._state: CircuitState = CircuitState.CLOSED
+        self._failures: int = 0
+        self._opened_at: float = 0.0
+        self._half_open_calls: int = 0
+        self._probe_at: float = 0.0
+
+    def reconfigure(self, config: CircuitBreakerConfig):
+        self._config = config
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self._config.recovery_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+            self._probe_at = time.monotonic()
+        return self._state
+
+    def allow(self) -> bool:
+        if not self._config.enabled:
+            return True
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN:
+            # 探测请求没有回报结果时，超时后重新放行
+            if time.monotonic() - self._probe_at >= self._config.recovery_timeout:
+                self._half_open_calls = 0
+            if self._half_open_calls < self._config.half_open_max_calls:
+                self._half_open_calls += 1
+                self._probe_at = time.monotonic()
+                return True
+        return False
+
+    def record_success(self):
+        if self._state != CircuitState.CLOSED:
+            logger.info("Circuit breaker for {name} closed", name = self._name)
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+
+    def record_failure(self):
+        if not self._config.enabled:
+            return
+        self._failures += 1
+        if self._state == CircuitState.HALF_OPEN or self._failures >= self._config.failure_threshold:
+            if self._state != CircuitState.OPEN:
+                logger.warning(
+                    "Circuit breaker for {name} opened after {failures} failures",
+                    name = self._name,
+                    failures = self._failures,
+                )
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+
+circuit_breakers: ServerRegistry[CircuitBreaker] = ServerRegistry(
+    lambda server: CircuitBreaker(server.circuit_breaker, name = f"{server.host}:{server.port}"),
+    settings = lambda server: server.circuit_breaker,
+    name = "Circuit breaker",
+)
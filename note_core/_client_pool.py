@@ -0,0 +1,50 @@
+import httpx
+from loguru import logger
+from ._config import ServerConfig
+
+class _PooledClient:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.refs: int = 0
+
+class ClientPool:
+    """
+    Process-wide registry of HTTP clients.
+
+    Every worker targeting the same `(protocol, host, port)` gets the same
+    pooled `httpx.AsyncClient`. The client is closed when its last user releases it.
+    """
+
+    def __init__(self):
+        self._clients: dict[tuple[str, str, int], _PooledClient] = {}
+
+    def acquire(self, server: ServerConfig) -> httpx.AsyncClient:
+        key = server.key
+        entry = self._clients.get(key)
+        if entry is None:
+            limits = httpx.Limits(
+                max_connections = server.pool.max_connections,
+                max_keepalive_connections = server.pool.max_keepalive_connections,
+                keepalive_expiry = server.pool.keepalive_expiry,
+            )
+            entry = _PooledClient(httpx.AsyncClient(limits = limits))
+            self._clients[key] = entry
+            logger.debug("Created HTTP client for {key}", key = key)
+        entry.refs += 1
+        return entry.client
+
+    async def release(self, server: ServerConfig):
+        key = server.key
+        entry = self._clients.get(key)
+        if entry is None:
+            return
+        entry.refs -= 1
+        if entry.refs <= 0:
+            del self._clients[key]
+            await entry.client.aclose()
+            logger.debug("Closed HTTP client for {key}", key = key)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+client_pool = ClientPool()
@@ -0,0 +1,67 @@
+import bz2
+import gzip
+import lzma
+import os
+from pathlib import Path
+from typing import BinaryIO
+from ._config import Compression
+
+SUFFIXES: dict[Compression, str] = {
+    Compression.GZIP: ".gz",
+    Compression.BZ2: ".bz2",
+    Compression.LZMA: ".xz",
+}
+
+def compress(data: bytes, compression: Compression, level: int | None = None) -> bytes:
+    if compression == Compression.GZIP:
+        return gzip.compress(data, compresslevel = 9 if level is None else level)
+    if compression == Compression.BZ2:
+        return bz2.compress(data, compresslevel = 9 if level is None else level)
+    if compression == Compression.LZMA:
+        return lzma.compress(data, preset = level)
+    return data
+
+def decompress(data: bytes, compression: Compression) -> bytes:
+    if compression == Compression.GZIP:
+        return gzip.decompress(data)
+    if compression == Compression.BZ2:
+        return bz2.decompress(data)
+    if compression == Compression.LZMA:
+        return lzma.decompress(data)
+    return data
+
+def detect(path: str | os.PathLike) -> Compression:
+    """
+    Compression of a note file, judged by its suffix.
+    """
+    suffix = Path(path).suffix
+    for compression, compressed_suffix in SUFFIXES.items():
+        if suffix == compressed_suffix:
+            return compression
+    return Compression.NONE
+
+def with_suffix(path: Path, compression: Compression) -> Path:
+    suffix = SUFFIXES.get(compression)
+    return path if suffix is None else path.with_name(path.name + suffix)
+
+def strip_suffix(path: Path) -> Path:
+    if detect(path) == Compression.NONE:
+        return path
+    return path.with_name(path.name[:-len(path.suffix)])
+
+def open_note(path: str | os.PathLike) -> BinaryIO:
+    """
+    Open a note file for reading, decompressing it on the fly.
+    """
+    compression = detect(path)
+    if compression == Compression.GZIP:
+        return gzip.open(path, "rb")
+    if compression == Compression.BZ2:
+        return bz2.open(path, "rb")
+    if compression == Compression.LZMA:
+        return lzma.open(path, "rb")
+    return open(path, "rb")
+
+def read_note(path: str | os.PathLike) -> bytes:
+    with open_note(path) as f:
+        return f.read()
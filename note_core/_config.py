@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
+from datetime import time
 from enum import StrEnum
+from ._note_template import compile_template
 
 class Agreement(StrEnum):
     HTTP = "http"
@@ -9,12 +11,67 @@ class OutputFormat(StrEnum):
     TEXT = "text"
     JSON = "json"
     YAML = "yaml"
+    TEMPLATE = "template"
+
+class BackoffStrategy(StrEnum):
+    CONSTANT = "constant"
+    LINEAR = "linear"
+    EXPONENTIAL = "exponential"
+
+class JitterMode(StrEnum):
+    NONE = "none"
+    FULL = "full"
+    EQUAL = "equal"
+
+class RetryConfig(BaseModel):
+    backoff: BackoffStrategy = BackoffStrategy.EXPONENTIAL
+    multiplier: float = 2.0
+    max_interval: float = 30.0
+    jitter: JitterMode = JitterMode.FULL
+    # 所有重试等待时间之和的上限（秒），None 表示不限制
+    budget: float | None = None
+    retryable_status_codes: list[int] = Field(
+        default_factory = lambda: [408, 425, 429, 500, 502, 503, 504]
+    )
+
+class CircuitBreakerConfig(BaseModel):
+    enabled: bool = True
+    failure_threshold: int = 5
+    recovery_timeout: float = 60.0
+    half_open_max_calls: int = 1
+
+class LimiterConfig(BaseModel):
+    # 同时进行的生成请求数上限，None 表示不限制
+    max_concurrent_requests: int | None = None
+    # 令牌桶：每秒发放的请求数与桶容量，None 表示不限制
+    rate: float | None = None
+    burst: int = 1
+
+class PoolConfig(BaseModel):
+    max_connections: int | None = 100
+    max_keepalive_connections: int | None = 20
+    keepalive_expiry: float | None = 5.0
 
 class ServerConfig(BaseModel):
     host: str = '127.0.0.1'
     port: int = 8000
     protocol: Agreement = Agreement.HTTP
     timeout: float = 60.0
+    # 同一服务器的所有 Worker 共享连接池
+    pool: PoolConfig = Field(default_factory = PoolConfig)
+    # 同一服务器的所有 Worker 共享熔断器
+    circuit_breaker: CircuitBreakerConfig = Field(default_factory = CircuitBreakerConfig)
+    # 同一服务器的所有 Worker 共享限流器
+    limiter: LimiterConfig = Field(default_factory = LimiterConfig)
+    # 用户列表缓存时间（秒），同一服务器的所有 Worker 共享
+    userlist_cache_ttl: float = 60.0
+
+    @property
+    def key(self) -> tuple[str, str, int]:
+        """
+        Identity of the server, shared by every worker targeting it.
+        """
+        return (self.protocol.value, self.host, self.port)
 
 class UserInfoConfig(BaseModel):
     username: str | None = None
@@ -22,6 +79,44 @@ class UserInfoConfig(BaseModel):
     age: int | None = None
     gender: str | None = None
 
+class Compression(StrEnum):
+    NONE = "none"
+    GZIP = "gzip"
+    BZ2 = "bz2"
+    LZMA = "lzma"
+
+class StorageBackend(StrEnum):
+    # 每条笔记一个文件，按日期分目录
+    FILES = "files"
+    # 追加写入 output_dir/segments 下的 NDJSON 分段文件
+    SEGMENTS = "segments"
+    # 写入 SQLite 数据库，支持全文检索
+    SQLITE = "sqlite"
+
+class StorageConfig(BaseModel):
+    backend: StorageBackend = StorageBackend.FILES
+    # segments 模式下单个分段文件的大小上限（字节）
+    segment_max_bytes: int = 64 * 1024 * 1024
+    # sqlite 模式下的数据库文件，默认为 output_dir/notes.db
+    sqlite_file: str | None = None
+    # 写入线程每个事务最多提交的笔记数
+    sqlite_batch_size: int = 64
+
+class TimeWindow(BaseModel):
+    # 结束时间不晚于开始时间时视为跨越午夜，00:00 作为结束时间表示一天的结束
+    start: time = time(0, 0)
+    end: time = time(0, 0)
+    weight: float = 1.0
+
+class ScheduleConfig(BaseModel):
+    # 允许运行的时间窗口，为空时表示全天
+    windows: list[TimeWindow] = Field(default_factory = list)
+    runs_per_day: int = 1
+    # 根据服务器在各时段的延迟与错误率调整运行时间的分布
+    load_aware: bool = False
+    # 偏向低负载时段的强度，0 表示不偏向
+    load_bias: float = 1.0
+
 class Config(BaseModel):
     # 服务器配置
     server: ServerConfig = Field(default_factory = ServerConfig)
@@ -30,6 +125,109 @@ class Config(BaseModel):
     output_dir: str = "./output"
     output_file_suffix: str = ".md"
     user_info: UserInfoConfig = Field(default_factory = UserInfoConfig)
-    output_format: OutputFormat = OutputFormat.TEXT
+    # 内置格式，或通过 register_formatter 注册的自定义格式名
+    output_format: OutputFormat | str = OutputFormat.TEXT
+    # output_format 为 template 时使用的 str.format 模板
+    output_template: str | None = None
+    storage: StorageConfig = Field(default_factory = StorageConfig)
+    # files 模式下压缩笔记文件，文件名追加 .gz/.bz2/.xz
+    compression: Compression = Compression.NONE
+    # 压缩级别，None 表示使用默认级别
+    compression_level: int | None = None
+    # files 模式下按内容去重：CoT 与 Answer 存入 output_dir/blobs，笔记文件只保存清单
+    dedup: bool = False
+    # 流式生成，边接收边写入笔记文件
+    stream: bool = False
     retry_times: int = 3
-    retry_interval: float = 0.5
\ No newline at end of file
+    retry_interval: float = 0.5
+    retry: RetryConfig = Field(default_factory = RetryConfig)
+    schedule: ScheduleConfig = Field(default_factory = ScheduleConfig)
+
+    @field_validator("output_format")
+    @classmethod
+    def _coerce_output_format(cls, value: OutputFormat | str) -> OutputFormat | str:
+        try:
+            return OutputFormat(value)
+        except ValueError:
+            return value
+
+    @field_validator("output_template")
+    @classmethod
+    def _compile_output_template(cls, value: str | None) -> str | None:
+        if value is not None:
+            # 在加载配置时编译一次，同时检查字段名
+            compile_template(value)
+        return value
+
+    @model_validator(mode = "after")
+    def _check_output_template(self):
+        if self.output_format == OutputFormat.TEMPLATE and self.output_template is None:
+            raise ValueError("output_format 'template' requires output_template")
+        if self.stream and self.output_format not in (OutputFormat.TEXT, OutputFormat.JSON, OutputFormat.YAML):
+            # 流式输出按块写入，只支持内置格式
+            raise ValueError(f"output_format '{self.output_format}' does not support stream")
+        if self.stream and self.storage.backend != StorageBackend.FILES:
+            raise ValueError(f"storage backend '{self.storage.backend}' does not support stream")
+        if self.stream and self.compression != Compression.NONE:
+            raise ValueError("compression does not support stream")
+        if self.stream and self.dedup:
+            raise ValueError("dedup does not support stream")
+        if self.storage.backend != StorageBackend.FILES and (self.compression != Compression.NONE or self.compression_level is not None):
+            # 分段与 SQLite 存储不经过文件压缩，配置了也不会生效
+            raise ValueError(f"storage backend '{self.storage.backend}' does not support compression")
+        if self.storage.backend != StorageBackend.FILES and self.dedup:
+            raise ValueError(f"storage backend '{self.storage.backend}' does not support dedup")
+        return self
+
+class SchedulerConfig(BaseModel):
+    # 同时执行的任务数上限
+    max_workers: int = 16
+
+class StartupConfig(BaseModel):
+    # 首次运行分散到的时间窗口（秒），每个配置的偏移由其路径的哈希决定
+    first_run_window: float = 0.0
+    # 同时处于启动阶段的 Worker 数上限，None 表示不限制
+    max_starting: int | None = 8
+
+class WatchConfig(BaseModel):
+    # 监视配置目录并热重载
+    enabled: bool = True
+    interval: float = 5.0
+
+class WriterConfig(BaseModel):
+    # 等待写入的笔记数上限，超过后生成任务等待磁盘
+    max_queue: int = 256
+    # 写入线程每批最多写入的笔记数
+    batch_size: int = 32
+    # fsync 每个临时文件，每批写入后 fsync 一次目录
+    fsync: bool = True
+
+class ArchiveConfig(BaseModel):
+    # 将旧的日期目录归档为 output_dir/archive 下的 tar 文件
+    enabled: bool = False
+    # 归档早于该天数的日期目录
+    after_days: int = 30
+    compression: Compression = Compression.GZIP
+    # 删除早于该天数的归档，None 表示不按时间删除
+    retention_days: int | None = None
+    # 每个 output_dir 下归档的总大小上限（字节），超过时删除最旧的归档
+    max_bytes: int | None = None
+    # 检查间隔（秒）
+    interval: float = 3600.0
+
+class RuntimeConfig(BaseModel):
+    """
+    Process-wide settings shared by all workers.
+    """
+    config_dir: str = "./config"
+    # 保存各 Worker 的下一次运行时间与上一次成功时间
+    state_file: str = "./data/schedule_state.json"
+    # 已验证配置的缓存，未修改的配置文件启动时无需重新解析
+    config_cache_file: str = "./data/config_cache.json"
+    # 保存各服务器分时段的负载统计
+    load_profile_file: str = "./data/load_profile.json"
+    scheduler: SchedulerConfig = Field(default_factory = SchedulerConfig)
+    startup: StartupConfig = Field(default_factory = StartupConfig)
+    watch: WatchConfig = Field(default_factory = WatchConfig)
+    writer: WriterConfig = Field(default_factory = WriterConfig)
+    archive: ArchiveConfig = Field(default_factory = ArchiveConfig)
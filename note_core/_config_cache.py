@@ -0,0 +1,91 @@
+import os
+import asyncio
+import threading
+import aiofiles
+import orjson
+from pathlib import Path
+from pydantic import BaseModel, Field, ValidationError
+from loguru import logger
+from ._config import Config
+from ._atomic import atomic_write
+
+class CachedConfig(BaseModel):
+    mtime_ns: int
+    size: int
+    config: dict
+
+class ConfigCacheData(BaseModel):
+    entries: dict[str, CachedConfig] = Field(default_factory = dict)
+
+class ConfigCache:
+    """
+    Snapshot of validated configs keyed by path, mtime and size.
+
+    Unchanged config files are restored from one JSON snapshot instead of
+    being read and parsed one by one.
+    """
+
+    def __init__(self, cache_file: str | os.PathLike):
+        self._cache_file = Path(cache_file)
+        self._data = ConfigCacheData()
+        self._dirty: bool = False
+        self._write_lock = threading.Lock()
+
+    async def load(self):
+        if not self._cache_file.exists():
+            return
+        try:
+            async with aiofiles.open(self._cache_file, "rb") as f:
+                self._data = ConfigCacheData(**orjson.loads(await f.read()))
+            logger.debug(
+                "Loaded {count} cached configs from {path}",
+                count = len(self._data.entries),
+                path = str(self._cache_file),
+            )
+        except (orjson.JSONDecodeError, ValidationError) as e:
+            logger.warning(f"Invalid config cache, ignoring it: {e}")
+            self._data = ConfigCacheData()
+
+    def get(self, path: Path, stat: os.stat_result) -> Config | None:
+        entry = self._data.entries.get(str(path))
+        if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+            return None
+        try:
+            return Config.model_validate(entry.config)
+        except ValidationError:
+            # 配置模型升级后旧缓存可能失效
+            return None
+
+    def put(self, path: Path, stat: os.stat_result, config: Config):
+        self._data.entries[str(path)] = CachedConfig(
+            mtime_ns = stat.st_mtime_ns,
+            size = stat.st_size,
+            config = config.model_dump(mode = "json"),
+        )
+        self._dirty = True
+
+    def discard(self, path: Path):
+        if self._data.entries.pop(str(path), None) is not None:
+            self._dirty = True
+
+    def prune(self, paths: set[Path]):
+        """
+        Drop entries for files that no longer exist.
+        """
+        keep = {str(path) for path in paths}
+        for key in list(self._data.entries):
+            if key not in keep:
+                del self._data.entries[key]
+                self._dirty = True
+
+    async def save(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        data = orjson.dumps(self._data.model_dump(mode = "json"))
+        await asyncio.to_thread(self._write, data)
+
+    def _write(self, data: bytes):
+        with self._write_lock:
+            # 缓存丢失只会导致重新解析，不需要 fsync
+            atomic_write(self._cache_file, data, fsync = False)
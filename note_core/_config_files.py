@@ -0,0 +1,32 @@
+import os
+from pathlib import Path
+from typing import Generator
+
+CONFIG_SUFFIXES = frozenset({'.yaml', '.yml', '.json'})
+
+def scan_config_files(base_path: str | os.PathLike) -> dict[Path, os.stat_result]:
+    """
+    Walk the config directory once and return every config file with its stat.
+    """
+    if not Path(base_path).is_dir():
+        raise NotADirectoryError(f"{base_path} is not a directory")
+    result: dict[Path, os.stat_result] = {}
+    stack: list[str] = [os.fspath(base_path)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif (
+                    entry.is_file()
+                    and not entry.name.startswith("#")
+                    and os.path.splitext(entry.name)[1] in CONFIG_SUFFIXES
+                ):
+                    try:
+                        result[Path(entry.path)] = entry.stat()
+                    except FileNotFoundError:
+                        continue
+    return result
+
+def find_config_file(base_path: str | os.PathLike) -> Generator[Path, None, None]:
+    yield from scan_config_files(base_path)
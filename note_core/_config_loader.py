@@ -1,4 +1,6 @@
 from ._config import Config
+from . import _yaml_backend
+from pydantic import BaseModel
 from loguru import logger
 from pathlib import Path
 import aiofiles
@@ -6,25 +8,28 @@ import orjson
 import yaml
 import os
 
+YAML_SUFFIXES = ('.yaml', '.yml')
+
 class ConfigLoader:
     """
     ConfigLoader is a class that loads the configuration from the config file.
     """
 
-    def __init__(self, config_file: str | os.PathLike):
+    def __init__(self, config_file: str | os.PathLike, model: type[BaseModel] = Config):
         self._config_file: Path = Path(config_file)
-        self._config: Config = Config()
+        self._model = model
+        self._config: BaseModel = model()
     
     @property
     def config(self):
         return self._config
     
     @config.setter
-    def config(self, config: Config):
-        if isinstance(config, Config):
+    def config(self, config: BaseModel):
+        if isinstance(config, self._model):
             self._config = config
         else:
-            raise TypeError("Config must be an instance of Config")
+            raise TypeError(f"Config must be an instance of {self._model.__name__}")
 
     async def load(self, fail_writes_default: bool = True):
         """
@@ -39,7 +44,7 @@ class ConfigLoader:
                     await self._save_json()
                 else:
                     raise
-        elif self._config_file.suffix == '.yaml':
+        elif self._config_file.suffix in YAML_SUFFIXES:
             try:
                 self._config = await self._load_yaml()
             except (FileNotFoundError, yaml.YAMLError):
@@ -60,7 +65,7 @@ class ConfigLoader:
         logger.debug(f"Loading config from {self._config_file}")
         async with aiofiles.open(self._config_file, 'rb') as f:
             data = await f.read()
-            return Config(**orjson.loads(data))
+            return self._model(**orjson.loads(data))
     
     async def _load_yaml(self):
         """
@@ -69,7 +74,7 @@ class ConfigLoader:
         logger.debug(f"Loading config from {self._config_file}")
         async with aiofiles.open(self._config_file, 'r') as f:
             data = await f.read()
-            return Config(**yaml.safe_load(data))
+            return self._model(**await _yaml_backend.load_async(data))
 
     async def save(self):
         """
@@ -77,7 +82,7 @@ class ConfigLoader:
         """
         if self._config_file.suffix == '.json':
             await self._save_json()
-        elif self._config_file.suffix == '.yaml':
+        elif self._config_file.suffix in YAML_SUFFIXES:
             await self._save_yaml()
         else:
             raise ValueError('Unsupported file format')
@@ -88,7 +93,7 @@ class ConfigLoader:
         """
         logger.debug(f"Saving config to {self._config_file}")
         async with aiofiles.open(self._config_file, 'wb') as f:
-            await f.write(orjson.dumps(self._config.model_dump()))
+            await f.write(orjson.dumps(self._config.model_dump(mode = 'json')))
 
     async def _save_yaml(self):
         """
@@ -96,4 +101,4 @@ class ConfigLoader:
         """
         logger.debug(f"Saving config to {self._config_file}")
         async with aiofiles.open(self._config_file, 'w') as f:
-            await f.write(yaml.safe_dump(self._config.model_dump()))
\ No newline at end of file
+            await f.write(_yaml_backend.dump(self._config.model_dump(mode = 'json')))
\ No newline at end of file
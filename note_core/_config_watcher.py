@@ -0,0 +1,108 @@
+import os
+import asyncio
+from pathlib import Path
+from loguru import logger
+from ._config_files import scan_config_files
+from ._config_cache import ConfigCache
+from ._worker_manager import WorkerManager
+
+class ConfigWatcher:
+    """
+    Polls the config directory and applies changes to the running workers.
+
+    New files start a worker, deleted files stop theirs, and files whose
+    mtime or size changed are reloaded in place. Unchanged workers are not touched.
+    """
+
+    def __init__(
+            self,
+            config_dir: str | os.PathLike,
+            manager: WorkerManager,
+            interval: float = 5.0,
+            config_cache: ConfigCache | None = None,
+        ):
+        self._config_dir = Path(config_dir)
+        self._manager = manager
+        self._interval = interval
+        self._config_cache = config_cache
+        self._known: dict[Path, os.stat_result] = {}
+        self._starting: dict[Path, asyncio.Task] = {}
+        # 启动期间被修改的配置，启动完成后再重新加载
+        self._deferred: set[Path] = set()
+
+    @staticmethod
+    def _changed(old: os.stat_result, new: os.stat_result) -> bool:
+        return (old.st_mtime_ns, old.st_size) != (new.st_mtime_ns, new.st_size)
+
+    @property
+    def known(self) -> dict[Path, os.stat_result]:
+        return self._known
+
+    async def snapshot(self):
+        """
+        Record the current state of the directory as the baseline.
+        """
+        self._known = await asyncio.to_thread(scan_config_files, self._config_dir)
+
+    async def poll(self):
+        current = await asyncio.to_thread(scan_config_files, self._config_dir)
+
+        for path in self._known.keys() - current.keys():
+            logger.info(f"Config removed: {path}")
+            self._deferred.discard(path)
+            starting = self._starting.pop(path, None)
+            if starting is not None:
+                starting.cancel()
+            await self._apply(self._manager.stop(path, forget = True), path)
+        for path in current.keys() - self._known.keys():
+            logger.info(f"Config added: {path}")
+            self._start(path, current[path])
+        for path in current.keys() & self._known.keys():
+            if self._changed(self._known[path], current[path]):
+                logger.info(f"Config changed: {path}")
+                if path in self._starting:
+                    self._deferred.add(path)
+                elif path in self._manager:
+                    await self._apply(self._manager.reload(path), path)
+                else:
+                    # 之前启动失败，按新内容重新启动
+                    self._start(path, current[path])
+
+        self._known = current
+        if self._config_cache is not None:
+            await self._config_cache.save()
+
+    def _start(self, path: Path, stat: os.stat_result):
+        # 启动可能需要等待启动分散的偏移，不阻塞下一次轮询
+        task = asyncio.create_task(self._run_start(path, stat))
+        self._starting[path] = task
+        task.add_done_callback(lambda _, path = path: self._starting.pop(path, None))
+
+    async def _run_start(self, path: Path, stat: os.stat_result):
+        await self._apply(self._manager.start(path, stat, fail_writes_default = False), path)
+        while path in self._deferred:
+            self._deferred.discard(path)
+            logger.info(f"Config changed while starting, reloading: {path}")
+            if path in self._manager:
+                await self._apply(self._manager.reload(path), path)
+            else:
+                await self._apply(self._manager.start(path, fail_writes_default = False), path)
+
+    @staticmethod
+    async def _apply(action, path: Path):
+        try:
+            await action
+        except Exception as e:
+            logger.opt(exception = e).error(f"Failed to apply config change for {path}: {e}")
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self._interval)
+                try:
+                    await self.poll()
+                except Exception as e:
+                    logger.opt(exception = e).error(f"Config watcher failed: {e}")
+        finally:
+            for task in list(self._starting.values()):
+                task.cancel()
@@ -0,0 +1,185 @@
+import os
+import time
+import hashlib
+import asyncio
+import threading
+import orjson
+from pathlib import Path
+from typing import Any
+from ._config import Compression, OutputFormat
+from ._compression import SUFFIXES, compress, decompress, detect
+from ._formatters import get_formatter
+from ._note_template import compile_template
+from ._registry import PathRegistry
+from ._atomic import atomic_write
+
+MANIFEST_SUFFIX = ".manifest.json"
+# 清单中不属于笔记字段的键
+MANIFEST_KEYS = ("Format", "Template", "Suffix")
+
+def digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size = 32).hexdigest()
+
+class BlobStore:
+    """
+    Content-addressed store of note bodies, keyed by their BLAKE2b digest.
+
+    Identical bodies are written once; later notes only reference them.
+    Blobs no manifest refers to any more are removed by `sweep`.
+    """
+
+    # 未被引用的 blob 至少保留的秒数，覆盖清单仍在写入队列中的情况
+    SWEEP_GRACE = 3600.0
+
+    def __init__(self, directory: str | os.PathLike):
+        self._directory = Path(directory)
+        # 摘要 -> 最近一次写入或复用的时间
+        self._known: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def _path(self, key: str, compression: Compression = Compression.NONE) -> Path:
+        return self._directory / key[:2] / f"{key}{SUFFIXES.get(compression, '')}"
+
+    def _find(self, key: str) -> Path | None:
+        for compression in Compression:
+            path = self._path(key, compression)
+            if path.exists():
+                return path
+        return None
+
+    def _put(self, data: bytes, compression: Compression, level: int | None) -> str:
+        key = digest(data)
+        with self._lock:
+            # 与 sweep 互斥，避免复用的 blob 在清单写入前被删除
+            if key not in self._known and self._find(key) is None:
+                atomic_write(self._path(key, compression), compress(data, compression, level))
+            self._known[key] = time.time()
+        return key
+
+    async def put(self, data: bytes, compression: Compression = Compression.NONE, level: int | None = None) -> str:
+        """
+        Store `data` unless an identical blob exists. Returns its digest.
+        """
+        return await asyncio.to_thread(self._put, data, compression, level)
+
+    def get(self, key: str) -> bytes:
+        path = self._find(key)
+        if path is None:
+            raise FileNotFoundError(f"Blob not found: {key}")
+        return decompress(path.read_bytes(), detect(path))
+
+    def sweep(self, referenced: set[str], grace: float | None = None) -> int:
+        """
+        Delete blobs not in `referenced` that were not stored or reused in
+        the last `grace` seconds. Returns the number of deleted blobs.
+        """
+        if not self._directory.is_dir():
+            return 0
+        cutoff = time.time() - (self.SWEEP_GRACE if grace is None else grace)
+        removed = 0
+        for path in self._directory.glob("*/*"):
+            key = path.name.split(".", 1)[0]
+            if path.name.startswith(".") or key in referenced:
+                continue
+            with self._lock:
+                if self._known.get(key, 0.0) >= cutoff:
+                    continue
+                try:
+                    if path.stat().st_mtime >= cutoff:
+                        continue
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                self._known.pop(key, None)
+            removed += 1
+        return removed
+
+blob_stores: PathRegistry[BlobStore] = PathRegistry(BlobStore)
+
+async def build_manifest(
+        fields: dict[str, Any],
+        store: BlobStore,
+        output_format: OutputFormat | str,
+        output_template: str | None = None,
+        suffix: str = "",
+        compression: Compression = Compression.NONE,
+        compression_level: int | None = None,
+    ) -> bytes:
+    """
+    Move the CoT and Answer of a note into `store` and return its manifest.
+
+    The manifest keeps the header fields, the blob digests, the output
+    format and file suffix, so `restore_note` can render the original note again.
+    """
+    manifest: dict[str, Any] = {key: value for key, value in fields.items() if key not in ("CoT", "Answer")}
+    for key in ("CoT", "Answer"):
+        body: str = fields[key] or ""
+        if not body:
+            manifest[key] = None
+            continue
+        data = body.encode("utf-8")
+        manifest[key] = {
+            "blake2b": await store.put(data, compression, compression_level),
+            "size": len(data),
+        }
+    manifest["Format"] = str(output_format)
+    manifest["Suffix"] = suffix
+    if output_template is not None:
+        manifest["Template"] = output_template
+    return orjson.dumps(manifest)
+
+def manifest_blobs(data: bytes) -> set[str]:
+    """
+    Digests of the blobs a manifest refers to.
+    """
+    manifest = orjson.loads(data)
+    blobs: set[str] = set()
+    for key in ("CoT", "Answer"):
+        ref = manifest.get(key)
+        if ref is not None:
+            blobs.add(ref["blake2b"])
+    return blobs
+
+def _resolve(manifest: dict[str, Any], store: BlobStore) -> dict[str, Any]:
+    fields = {key: value for key, value in manifest.items() if key not in MANIFEST_KEYS}
+    for key in ("CoT", "Answer"):
+        ref = manifest.get(key)
+        fields[key] = "" if ref is None else store.get(ref["blake2b"]).decode("utf-8")
+    return fields
+
+def _default_store(path: Path) -> BlobStore:
+    # 清单位于 output_dir/YYYY-MM-DD/ 下，blob 位于 output_dir/blobs/
+    return blob_stores.get(path.parent.parent / "blobs")
+
+def load_manifest(path: str | os.PathLike, store: BlobStore | None = None) -> dict[str, Any]:
+    """
+    Note fields of a manifest, with CoT and Answer read back from the blob store.
+    """
+    path = Path(path)
+    return _resolve(orjson.loads(path.read_bytes()), store or _default_store(path))
+
+def restore_note(path: str | os.PathLike, store: BlobStore | None = None, data: bytes | None = None) -> bytes:
+    """
+    Render a deduplicated note in the format it was saved with.
+
+    For a manifest read from an archive, pass its content as `data` and
+    the path it had in its day directory as `path`.
+    """
+    path = Path(path)
+    manifest = orjson.loads(path.read_bytes() if data is None else data)
+    fields = _resolve(manifest, store or _default_store(path))
+    if manifest.get("Format") == OutputFormat.TEMPLATE:
+        return compile_template(manifest["Template"]).render(fields)
+    return get_formatter(manifest.get("Format", OutputFormat.JSON))(fields)
+
+def restored_name(path: str | os.PathLike, data: bytes | None = None) -> str:
+    """
+    File name the note would have had without dedup.
+    """
+    path = Path(path)
+    suffix = orjson.loads(path.read_bytes() if data is None else data).get("Suffix", "")
+    return path.name[:-len(MANIFEST_SUFFIX)] + suffix
@@ -0,0 +1,51 @@
+import os
+import asyncio
+import threading
+from pathlib import Path
+from ._atomic import atomic_write
+
+class DelayedSave:
+    """
+    Base for state persisted to one file, with changes coalesced into one
+    atomic write `save_delay` seconds after the first of them.
+
+    Subclasses implement `_dump` and call `_schedule_save` after each change.
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None, save_delay: float = 1.0):
+        self._path: Path | None = Path(path) if path is not None else None
+        self._save_delay = save_delay
+        self._save_task: asyncio.Task | None = None
+        self._write_lock = threading.Lock()
+
+    def _dump(self) -> bytes:
+        raise NotImplementedError
+
+    def _schedule_save(self):
+        if self._path is None or self._save_task is not None:
+            return
+        try:
+            self._save_task = asyncio.get_running_loop().create_task(self._delayed_save())
+        except RuntimeError:
+            # 没有运行中的事件循环，交给下一次 flush
+            pass
+
+    async def _delayed_save(self):
+        await asyncio.sleep(self._save_delay)
+        self._save_task = None
+        await self.save()
+
+    async def flush(self):
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        await self.save()
+
+    async def save(self):
+        if self._path is None:
+            return
+        await asyncio.to_thread(self._write, self._dump())
+
+    def _write(self, data: bytes):
+        with self._write_lock:
+            atomic_write(self._path, data)
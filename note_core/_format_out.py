@@ -1,68 +1,206 @@
+import re
+import asyncio
 import aiofiles
 import orjson
-import yaml
 from datetime import datetime
 from ._response import NoteResponse
 from ._config import OutputFormat
+from ._formatters import get_formatter, note_fields
+from ._note_template import NoteTemplate
+from . import _yaml_backend
 from pathlib import Path
 
+# YAML 双引号标量中必须转义的字符：引号、反斜杠、控制字符、C1 控制字符（含 NEL）、
+# 行分隔符、BOM、代理项以及非字符
+_YAML_ESCAPE = re.compile(r'[\x00-\x1f"\\\x7f-\x9f\u2028\u2029\ufeff\ud800-\udfff\ufffe\uffff]')
+_YAML_ESCAPES = {'"': '\\"', "\\": "\\\\", "\n": "\\n", "\t": "\\t", "\r": "\\r"}
+
+def _yaml_escape_char(match: re.Match) -> str:
+    char = match.group()
+    escaped = _YAML_ESCAPES.get(char)
+    if escaped is not None:
+        return escaped
+    code = ord(char)
+    return f"\\x{code:02X}" if code < 0x100 else f"\\u{code:04X}"
+
+def _yaml_escape(text: str) -> str:
+    """
+    Body of a YAML double-quoted scalar holding `text`, without the quotes.
+    """
+    return _YAML_ESCAPE.sub(_yaml_escape_char, text)
+
 class FormatOutput:
     def __init__(
             self,
-            output_format: OutputFormat,
+            output_format: OutputFormat | str,
             path: Path,
             time: datetime | None = None,
             reference_context_user_id: str | None = None,
+            template: NoteTemplate | None = None,
         ):
         self._output_format = output_format
         self._path = path
         self._time = time or datetime.now()
         self._reference_context_user_id = reference_context_user_id
+        self._template = template
     
-    async def output(self, response: NoteResponse):
-        if self._output_format == OutputFormat.TEXT:
-            await self._format_text(response)
-        elif self._output_format == OutputFormat.JSON:
-            await self._format_json(response)
-        elif self._output_format == OutputFormat.YAML:
-            await self._format_yaml(response)
-        else:
-            raise ValueError("Invalid output format")
-    
-    async def _format_text(self, response: NoteResponse):
-        async with aiofiles.open(self._path, "w", encoding="utf-8") as f:
-            await f.write("# Repeater Note\n")
-            await f.write(f"- Note ID: {response.id}\n")
-            await f.write(f"- Time: {self._time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            await f.write(f"- Model ID: {response.model_id}\n")
-            await f.write(f"- Reference Context User ID: {self._reference_context_user_id}\n")
-            if response.reasoning_content:
-                await f.write(f"\n## CoT: \n{response.reasoning_content}\n")
-            if response.content:
-                await f.write(f"\n## Answer: \n{response.content}")
+    def render(self, response: NoteResponse) -> bytes:
+        """
+        Render the whole note into one buffer.
+        """
+        fields = note_fields(response, self._time, self._reference_context_user_id)
+        if self._output_format == OutputFormat.TEMPLATE:
+            if self._template is None:
+                raise ValueError("Template output format requires output_template")
+            return self._template.render(fields)
+        return get_formatter(self._output_format)(fields)
     
-    def _output_dict(self, response: NoteResponse):
-        return {
-            "Note ID": response.id,
-            "Time": self._time.strftime('%Y-%m-%d %H:%M:%S'),
-            "Model ID": response.model_id,
-            "Reference Context User ID": self._reference_context_user_id,
-            "CoT": response.reasoning_content,
-            "Answer": response.content
-        }
+    async def render_async(self, response: NoteResponse) -> bytes:
+        size = len(response.reasoning_content) + len(response.content)
+        if size > _yaml_backend.OFFLOAD_THRESHOLD:
+            # 长笔记在线程池中渲染，不阻塞其他 Worker 的定时器与连接
+            return await asyncio.to_thread(self.render, response)
+        return self.render(response)
     
-    async def _format_json(self, response: NoteResponse):
-        async with aiofiles.open(self._path, 'wb') as f:
-            await f.write(
-                orjson.dumps(
-                    self._output_dict(response)
+    async def output(self, response: NoteResponse):
+        data = await self.render_async(response)
+        async with aiofiles.open(self._path, "wb") as f:
+            await f.write(data)
+
+
+class StreamFormatOutput:
+    """
+    Incremental counterpart of `FormatOutput`.
+
+    Sections are spooled to disk as they arrive and assembled into the note
+    file by `finalize`, once the header fields are known.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+            self,
+            output_format: OutputFormat,
+            path: Path,
+            spool_path: Path,
+            time: datetime | None = None,
+            reference_context_user_id: str | None = None,
+        ):
+        self._output_format = output_format
+        self._path = path
+        self._time = time or datetime.now()
+        self._reference_context_user_id = reference_context_user_id
+        self._cot_spool = spool_path.with_name(f"{spool_path.name}.cot.part")
+        self._answer_spool = spool_path.with_name(f"{spool_path.name}.answer.part")
+        self._cot_file = None
+        self._answer_file = None
+        self._cot_size: int = 0
+        self._answer_size: int = 0
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @path.setter
+    def path(self, path: Path):
+        self._path = path
+
+    def _encode(self, text: str) -> bytes:
+        if self._output_format == OutputFormat.TEXT:
+            return text.encode("utf-8")
+        if self._output_format == OutputFormat.YAML:
+            # YAML 的可打印字符与换行规则与 JSON 不同，不能复用 JSON 转义
+            return _yaml_escape(text).encode("utf-8")
+        # JSON 字符串转义，去掉两侧引号
+        return orjson.dumps(text)[1:-1]
+
+    async def __aenter__(self):
+        self._cot_size = 0
+        self._answer_size = 0
+        self._cot_file = await aiofiles.open(self._cot_spool, "wb")
+        self._answer_file = await aiofiles.open(self._answer_spool, "wb")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._close_spools()
+        self._cot_spool.unlink(missing_ok = True)
+        self._answer_spool.unlink(missing_ok = True)
+
+    async def _close_spools(self):
+        if self._cot_file is not None:
+            await self._cot_file.close()
+            self._cot_file = None
+        if self._answer_file is not None:
+            await self._answer_file.close()
+            self._answer_file = None
+
+    async def write_reasoning(self, text: str):
+        if text:
+            data = self._encode(text)
+            self._cot_size += len(data)
+            await self._cot_file.write(data)
+
+    async def write_content(self, text: str):
+        if text:
+            data = self._encode(text)
+            self._answer_size += len(data)
+            await self._answer_file.write(data)
+
+    async def _copy(self, src: Path, dst):
+        async with aiofiles.open(src, "rb") as f:
+            while chunk := await f.read(self.CHUNK_SIZE):
+                await dst.write(chunk)
+
+    async def finalize(self, note_id: str, model_id: str):
+        await self._close_spools()
+        time = self._time.strftime('%Y-%m-%d %H:%M:%S')
+        async with aiofiles.open(self._path, "wb") as f:
+            if self._output_format == OutputFormat.TEXT:
+                await f.write(
+                    (
+                        "# Repeater Note\n"
+                        f"- Note ID: {note_id}\n"
+                        f"- Time: {time}\n"
+                        f"- Model ID: {model_id}\n"
+                        f"- Reference Context User ID: {self._reference_context_user_id}\n"
+                    ).encode("utf-8")
                 )
-            )
-    
-    async def _format_yaml(self, response: NoteResponse):
-        async with aiofiles.open(self._path, 'w', encoding='utf-8') as f:
-            await f.write(
-                yaml.safe_dump(
-                    self._output_dict(response)
+                if self._cot_size:
+                    await f.write(b"\n## CoT: \n")
+                    await self._copy(self._cot_spool, f)
+                    await f.write(b"\n")
+                if self._answer_size:
+                    await f.write(b"\n## Answer: \n")
+                    await self._copy(self._answer_spool, f)
+            elif self._output_format == OutputFormat.JSON:
+                header = orjson.dumps(
+                    {
+                        "Note ID": note_id,
+                        "Time": time,
+                        "Model ID": model_id,
+                        "Reference Context User ID": self._reference_context_user_id,
+                    }
+                )
+                await f.write(header[:-1] + b',"CoT":"')
+                await self._copy(self._cot_spool, f)
+                await f.write(b'","Answer":"')
+                await self._copy(self._answer_spool, f)
+                await f.write(b'"}')
+            elif self._output_format == OutputFormat.YAML:
+                # 与 format_yaml 相同的键顺序（按键名排序）：Answer、CoT 在其余字段之前
+                await f.write(b'Answer: "')
+                await self._copy(self._answer_spool, f)
+                await f.write(b'"\nCoT: "')
+                await self._copy(self._cot_spool, f)
+                await f.write(b'"\n')
+                header = _yaml_backend.dump(
+                    {
+                        "Note ID": note_id,
+                        "Time": time,
+                        "Model ID": model_id,
+                        "Reference Context User ID": self._reference_context_user_id,
+                    },
                 )
-            )
\ No newline at end of file
+                await f.write(header.encode("utf-8"))
+            else:
+                raise ValueError("Invalid output format")
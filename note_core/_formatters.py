@@ -0,0 +1,67 @@
+import orjson
+from datetime import datetime
+from typing import Any, Callable
+from ._response import NoteResponse
+from ._config import OutputFormat
+from . import _yaml_backend
+
+Formatter = Callable[[dict[str, Any]], bytes]
+
+_formatters: dict[str, Formatter] = {}
+
+def register_formatter(name: str, formatter: Formatter | None = None):
+    """
+    Register an output format. Can also be used as a decorator.
+
+    A formatter receives the note fields (see `note_fields`) and returns
+    the complete file content as bytes.
+    """
+    def decorator(func: Formatter) -> Formatter:
+        _formatters[str(name)] = func
+        return func
+    if formatter is not None:
+        return decorator(formatter)
+    return decorator
+
+def get_formatter(name: str) -> Formatter:
+    try:
+        return _formatters[str(name)]
+    except KeyError:
+        raise ValueError("Invalid output format") from None
+
+def note_fields(
+        response: NoteResponse,
+        time: datetime,
+        reference_context_user_id: str | None = None,
+    ) -> dict[str, Any]:
+    return {
+        "Note ID": response.id,
+        "Time": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "Model ID": response.model_id,
+        "Reference Context User ID": reference_context_user_id,
+        "CoT": response.reasoning_content,
+        "Answer": response.content
+    }
+
+@register_formatter(OutputFormat.TEXT)
+def format_text(fields: dict[str, Any]) -> bytes:
+    buffer: list[str] = [
+        "# Repeater Note\n",
+        f"- Note ID: {fields['Note ID']}\n",
+        f"- Time: {fields['Time']}\n",
+        f"- Model ID: {fields['Model ID']}\n",
+        f"- Reference Context User ID: {fields['Reference Context User ID']}\n",
+    ]
+    if fields["CoT"]:
+        buffer.append(f"\n## CoT: \n{fields['CoT']}\n")
+    if fields["Answer"]:
+        buffer.append(f"\n## Answer: \n{fields['Answer']}")
+    return "".join(buffer).encode("utf-8")
+
+@register_formatter(OutputFormat.JSON)
+def format_json(fields: dict[str, Any]) -> bytes:
+    return orjson.dumps(fields)
+
+@register_formatter(OutputFormat.YAML)
+def format_yaml(fields: dict[str, Any]) -> bytes:
+    return _yaml_backend.dump(fields).encode("utf-8")
@@ -0,0 +1,121 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from pydantic import BaseModel
+from loguru import logger
+from ._config import LimiterConfig
+from ._registry import ServerRegistry
+
+class LimiterStats(BaseModel):
+    acquired: int = 0
+    waiting: int = 0
+    in_flight: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.acquired if self.acquired else 0.0
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, holding at most `burst`.
+
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self._rate = rate
+        self._burst = max(1, burst)
+        self._tokens: float = float(self._burst)
+        self._updated_at: float = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+class ServerLimiter:
+    """
+    Concurrency and rate limit shared by every worker targeting one server.
+    """
+
+    def __init__(self, config: LimiterConfig, name: str = ""):
+        self._name = name
+        self._stats = LimiterStats()
+        self.reconfigure(config)
+
+    def reconfigure(self, config: LimiterConfig):
+        """
+        Apply new limits. Requests already holding a slot release it on the old limits.
+        """
+        self._semaphore = (
+            asyncio.Semaphore(config.max_concurrent_requests)
+            if config.max_concurrent_requests else None
+        )
+        self._bucket = TokenBucket(config.rate, config.burst) if config.rate else None
+
+    @property
+    def stats(self) -> LimiterStats:
+        return self._stats
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[float]:
+        """
+        Hold a request slot; yields the time spent queueing, in seconds.
+        """
+        start = time.monotonic()
+        # 重新配置期间已取得的槽位归还给原来的信号量
+        semaphore, bucket = self._semaphore, self._bucket
+        self._stats.waiting += 1
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                if bucket is not None:
+                    await bucket.acquire()
+            except BaseException:
+                if semaphore is not None:
+                    semaphore.release()
+                raise
+        finally:
+            self._stats.waiting -= 1
+
+        wait = time.monotonic() - start
+        self._stats.acquired += 1
+        self._stats.total_wait += wait
+        self._stats.max_wait = max(self._stats.max_wait, wait)
+        if wait >= 0.001:
+            logger.info(
+                "Waited {wait:.3f} seconds for a request slot on {name}",
+                wait = wait,
+                name = self._name,
+            )
+
+        self._stats.in_flight += 1
+        try:
+            yield wait
+        finally:
+            self._stats.in_flight -= 1
+            if semaphore is not None:
+                semaphore.release()
+
+class ServerLimiterRegistry(ServerRegistry[ServerLimiter]):
+    def stats(self) -> dict[tuple[str, str, int], LimiterStats]:
+        return {key: limiter.stats for key, limiter in self.items()}
+
+server_limiters = ServerLimiterRegistry(
+    lambda server: ServerLimiter(server.limiter, name = f"{server.host}:{server.port}"),
+    settings = lambda server: server.limiter,
+    name = "Limiter",
+)
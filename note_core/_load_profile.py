@@ -0,0 +1,96 @@
+import os
+import aiofiles
+import orjson
+from datetime import datetime
+from typing import ClassVar
+from pathlib import Path
+from pydantic import BaseModel, Field, ValidationError
+from loguru import logger
+from ._config import ServerConfig
+from ._delayed_save import DelayedSave
+
+class HourStats(BaseModel):
+    latency: float = 0.0
+    error_rate: float = 0.0
+    samples: int = 0
+
+class LoadProfile(BaseModel):
+    """
+    Rolling latency and error profile of one server, bucketed by hour of day.
+    """
+    hours: list[HourStats] = Field(default_factory = lambda: [HourStats() for _ in range(24)])
+
+    # 指数滑动平均的平滑系数
+    ALPHA: ClassVar[float] = 0.2
+    # 错误对代价的放大倍数
+    ERROR_PENALTY: ClassVar[float] = 4.0
+
+    def record(self, latency: float, ok: bool, when: datetime | None = None):
+        stats = self.hours[(when or datetime.now()).hour]
+        error = 0.0 if ok else 1.0
+        if stats.samples == 0:
+            stats.latency = latency
+            stats.error_rate = error
+        else:
+            stats.latency += self.ALPHA * (latency - stats.latency)
+            stats.error_rate += self.ALPHA * (error - stats.error_rate)
+        stats.samples += 1
+
+    def hour_weights(self, bias: float = 1.0) -> list[float]:
+        """
+        Per-hour scheduling weights, higher for hours with lower observed cost.
+
+        Hours without samples get a neutral weight of 1.
+        """
+        costs: list[float | None] = [
+            stats.latency * (1 + stats.error_rate * self.ERROR_PENALTY) if stats.samples else None
+            for stats in self.hours
+        ]
+        known = [cost for cost in costs if cost]
+        if not known or bias <= 0:
+            return [1.0] * 24
+        mean = sum(known) / len(known)
+        return [
+            min(20.0, max(0.05, (mean / cost) ** bias)) if cost else 1.0
+            for cost in costs
+        ]
+
+class LoadProfileData(BaseModel):
+    servers: dict[str, LoadProfile] = Field(default_factory = dict)
+
+class LoadProfileRegistry(DelayedSave):
+    """
+    Process-wide registry of per-server load profiles, optionally persisted.
+    """
+
+    def __init__(self, save_delay: float = 60.0):
+        super().__init__(save_delay = save_delay)
+        self._data = LoadProfileData()
+
+    @staticmethod
+    def _name(server: ServerConfig) -> str:
+        protocol, host, port = server.key
+        return f"{protocol}://{host}:{port}"
+
+    def get(self, server: ServerConfig) -> LoadProfile:
+        return self._data.servers.setdefault(self._name(server), LoadProfile())
+
+    def record(self, server: ServerConfig, latency: float, ok: bool):
+        self.get(server).record(latency, ok)
+        self._schedule_save()
+
+    async def load(self, profile_file: str | os.PathLike):
+        self._path = Path(profile_file)
+        if not self._path.exists():
+            return
+        try:
+            async with aiofiles.open(self._path, "rb") as f:
+                self._data = LoadProfileData(**orjson.loads(await f.read()))
+        except (orjson.JSONDecodeError, ValidationError) as e:
+            logger.warning(f"Invalid load profile, starting fresh: {e}")
+            self._data = LoadProfileData()
+
+    def _dump(self) -> bytes:
+        return orjson.dumps(self._data.model_dump(mode = "json"))
+
+load_profiles = LoadProfileRegistry()
@@ -1,124 +1,458 @@
-import json
 import time
+import uuid
 import httpx
-import random
+import orjson
 import asyncio
-import aiofiles
 from ._timer import Timer
-from ._config import Config
+from ._config import Config, ServerConfig, StorageBackend
+from ._client_pool import client_pool
+from ._retry import RetryPolicy
+from ._circuit_breaker import circuit_breakers
+from ._userlist_cache import userlist_caches
+from ._limiter import server_limiters
+from ._load_profile import load_profiles
+from ._prompt_store import Prompt, prompt_store
+from ._request_template import CompletionTemplate
+from ._userlist_stream import UserIdSnapshot, iter_json_string_array, reservoir_sample
 from ._response import NoteResponse
-from ._format_out import FormatOutput
+from ._format_out import FormatOutput, StreamFormatOutput
+from ._note_template import compile_template
+from ._formatters import note_fields
+from ._segment_log import segment_logs
+from ._sqlite_store import sqlite_stores
+from ._note_writer import note_writer
+from ._outbox import Outbox, OutboxEntry, outboxes
+from ._compression import with_suffix
+from ._dedup import MANIFEST_SUFFIX, blob_stores, build_manifest
 from pydantic import ValidationError
 from datetime import datetime
 from loguru import logger
 from pathlib import Path
 
 class NoteCore:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, retry_policy: RetryPolicy | None = None, owner: str | None = None):
         self._config = config
-        self._client = httpx.AsyncClient()
-        self._prompt: str = ""
+        # 发件箱条目归属，只重放自己生成的响应
+        self._owner = owner
+        self._client: httpx.AsyncClient | None = client_pool.acquire(config.server)
+        # 正在运行的 create_note 数量，以及等它们结束后才释放的客户端
+        self._runs: int = 0
+        self._retired: list[ServerConfig] = []
+        self._closed: bool = False
+        self._custom_retry_policy = retry_policy
+        self._retry_policy = retry_policy or RetryPolicy.from_config(config)
+        self._bind_server(config)
+        self._prompt: Prompt | None = None
+    
+    def _bind_server(self, config: Config):
+        self._base_url = (
+            f"{config.server.protocol.value}://"
+            f"{config.server.host}:{config.server.port}"
+        )
+        self._templates: dict[bool, CompletionTemplate] = {}
+        self._breaker = circuit_breakers.get(config.server)
+        self._userlist_cache = userlist_caches.get(config.server)
+        self._limiter = server_limiters.get(config.server)
+    
+    @property
+    def config(self) -> Config:
+        return self._config
+    
+    async def update_config(self, config: Config):
+        """
+        Swap in a new config without recreating the worker.
+
+        The new prompt is loaded first; if that fails the old config stays in effect.
+        """
+        prompt = await prompt_store.get(config.prompt_file)
+        old = self._config
+        if not self._closed and config.server.key != old.server.key:
+            self._client = client_pool.acquire(config.server)
+            await self._release(old.server)
+        self._config = config
+        self._retry_policy = self._custom_retry_policy or RetryPolicy.from_config(config)
+        self._bind_server(config)
+        self._prompt = prompt
     
     async def load_prompt(self):
-        path = Path(self._config.prompt_file)
-        if not path.exists():
-            logger.error(f"Prompt file not found: {self._config.prompt_file}")
-            raise FileNotFoundError(f"Prompt file not found: {self._config.prompt_file}")
-        logger.info(f"Load prompt from {self._config.prompt_file}")
-        async with aiofiles.open(path, "r", encoding="utf-8") as f:
-            self._prompt = await f.read()
+        """
+        Fetch the prompt from the shared store, reloading it if the file changed.
+        """
+        self._prompt = await prompt_store.get(self._config.prompt_file)
     
-    async def get_user_id_list(self) -> list[str]:
-        logger.info("Getting userid list...")
-        response = await self._client.get(
-            f"{self._config.server.protocol.value}://"
-            f"{self._config.server.host}:{self._config.server.port}"
-            "/userdata/context/userlist"
+    @property
+    def prompt(self) -> str:
+        return self._prompt.text if self._prompt is not None else ""
+    
+    def _open_userlist_stream(self, headers: dict[str, str] | None = None):
+        return self._client.stream(
+            "GET",
+            f"{self._base_url}/userdata/context/userlist",
+            headers = headers,
         )
-        user_id_list = response.json()
-        if not isinstance(user_id_list, list):
-            logger.error("Invalid userid list")
-            raise ValueError("Invalid userid list")
-        logger.info(f"Got {len(user_id_list)} userids")
-        return user_id_list
-    
-    async def send_request(self, reference_context_user_id: str | None = None):
+    
+    async def get_user_id_snapshot(self) -> UserIdSnapshot:
+        """
+        Full userid list, stored compactly and shared through the per-server cache.
+        """
+        logger.info("Getting userid list...")
+        snapshot = await self._userlist_cache.get(self._open_userlist_stream)
+        logger.info(f"Got {len(snapshot)} userids")
+        return snapshot
+    
+    async def get_user_id_list(self) -> list[str]:
+        return (await self.get_user_id_snapshot()).to_list()
+    
+    async def pick_reference_user_id(self) -> str | None:
+        """
+        Pick a random userid.
+
+        With the userlist cache enabled the pick comes from the shared
+        snapshot. Otherwise the list is streamed and reservoir-sampled
+        without ever being materialized.
+        """
+        if self._userlist_cache.enabled:
+            snapshot = await self.get_user_id_snapshot()
+            return snapshot.choice() if len(snapshot) else None
+        
+        logger.info("Sampling userid list...")
+        async with self._open_userlist_stream() as response:
+            response.raise_for_status()
+            sample = await reservoir_sample(
+                iter_json_string_array(response.aiter_bytes())
+            )
+        return sample[0] if sample else None
+    
+    def _template(self, stream: bool = False) -> CompletionTemplate:
+        if self._prompt is None:
+            raise RuntimeError("Prompt is not loaded, call load_prompt() first")
+        template = self._templates.get(stream)
+        if template is None or template.prompt_version != self._prompt.version:
+            template = CompletionTemplate(self._config, self._prompt, stream = stream)
+            self._templates[stream] = template
+        return template
+    
+    async def _post(self, reference_context_user_id: str | None = None) -> httpx.Response | None:
+        """
+        Send the completion request. Returns the last response, or None if every attempt failed.
+        """
         logger.info("Sending request to {host}:{port}...", host = self._config.server.host, port = self._config.server.port)
         start = time.monotonic_ns()
         
-        for i in range(self._config.retry_times):
-            try:
-                if i > 0:
-                    logger.info(f"Retrying ({i + 1}/{self._config.retry_times})...")
-                response = await self._client.post(
-                    (
-                        f"{self._config.server.protocol.value}://"
-                        f"{self._config.server.host}:{self._config.server.port}"
-                        f"/chat/completion/{self._config.namespace}"
-                    ),
-                    json = {
-                        "message": self._prompt,
-                        "cross_user_data_routing": {
-                            "context": {
-                                "load_from_user_id": reference_context_user_id
-                            }
-                        },
-                        "save_context": False,
-                        "user_info": self._config.user_info.model_dump(exclude_none = True)
-                    },
-                    timeout = self._config.server.timeout,
-                )
-                break
-            except Exception as e:
-                logger.error(f"Request failed: {e}")
-                asyncio.sleep(self._config.retry_interval)
+        template = self._template()
+        content = template.render(reference_context_user_id)
+        
+        async def attempt():
+            async with self._limiter.acquire():
+                # 只计入请求本身的耗时，不含限流排队与重试退避
+                sent = time.monotonic_ns()
+                try:
+                    response = await self._client.post(
+                        template.url,
+                        content = content,
+                        headers = template.HEADERS,
+                        timeout = self._config.server.timeout,
+                    )
+                except Exception:
+                    self._record_attempt(sent, None)
+                    raise
+                self._record_attempt(sent, response)
+                return response
+        
+        response = await self._retry_policy.run(attempt, breaker = self._breaker)
         end = time.monotonic_ns()
         logger.info(f"Request sent in {(end - start) / 1e9:.3f} seconds")
-
-        if response.status_code == 200:
-            try:
-                return NoteResponse(
-                    **response.json()
-                )
-            except json.JSONDecodeError:
-                logger.error(f"Failed to get note response: {response.status_code}")
-                raise
-            except ValidationError as e:
-                errors = e.errors()
-                for error in errors:
-                    logger.error(f"Validation error: {error['msg']}")
-                    logger.error(f"Field: {'.'.join(error['loc'])}")
-                    logger.error(f"CTX: {error['ctx']}")
-                raise
-        else:
+        if response is not None and response.status_code != 200:
             logger.error(f"Error sending request: {response.status_code}")
+        return response
+    
+    def _record_attempt(self, sent: int, response: httpx.Response | None):
+        """
+        Feed the duration and outcome of one request attempt to the server's load profile.
+        """
+        load_profiles.record(
+            self._config.server,
+            latency = (time.monotonic_ns() - sent) / 1e9,
+            ok = response is not None and response.status_code == 200,
+        )
+    
+    @staticmethod
+    def _parse_response(content: bytes) -> NoteResponse:
+        try:
+            return NoteResponse.model_validate_json(content)
+        except ValidationError as e:
+            errors = e.errors()
+            for error in errors:
+                logger.error(f"Validation error: {error['msg']}")
+                logger.error(f"Field: {'.'.join(str(loc) for loc in error['loc'])}")
+                logger.error(f"CTX: {error.get('ctx')}")
+            raise
+    
+    async def send_request(self, reference_context_user_id: str | None = None) -> NoteResponse | None:
+        response = await self._post(reference_context_user_id)
+        if response is None or response.status_code != 200:
             return None
+        return self._parse_response(response.content)
     
-    async def save_note(self, response: NoteResponse, reference_context_user_id: str | None = None):
-        now = datetime.now()
-        path = (
+    def _note_path(self, now: datetime, note_id: str, suffix: str | None = None) -> Path:
+        return (
             Path(self._config.output_dir) /
             now.strftime("%Y-%m-%d") /
             f"[{now.strftime('%Y-%m-%d-%H-%M-%S')}] "
-            f"{response.id}{self._config.output_file_suffix}"
+            f"{note_id}{self._config.output_file_suffix if suffix is None else suffix}"
         )
-        if not path.parent.exists():
-            path.parent.mkdir(parents=True)
-        fout = FormatOutput(
+    
+    async def stream_note(self, reference_context_user_id: str | None = None) -> Path | None:
+        """
+        Request a streamed completion and write the note as chunks arrive.
+
+        Returns the path of the saved note, or None if the request failed.
+        """
+        logger.info("Streaming request to {host}:{port}...", host = self._config.server.host, port = self._config.server.port)
+        start = time.monotonic_ns()
+        now = datetime.now()
+        day_dir = self._note_path(now, "").parent
+        if not day_dir.exists():
+            day_dir.mkdir(parents=True)
+        fout = StreamFormatOutput(
             output_format = self._config.output_format,
-            path = path,
+            path = day_dir,
+            spool_path = day_dir / f".{uuid.uuid4().hex}",
             time = now,
             reference_context_user_id = reference_context_user_id
         )
-        await fout.output(response = response)
+
+        template = self._template(stream = True)
+        content = template.render(reference_context_user_id)
+
+        async def attempt():
+            async with fout, self._limiter.acquire():
+                sent = time.monotonic_ns()
+                try:
+                    async with self._client.stream(
+                        "POST",
+                        template.url,
+                        content = content,
+                        headers = template.HEADERS,
+                        timeout = self._config.server.timeout,
+                    ) as response:
+                        if response.status_code == 200:
+                            note_id, model_id = await self._consume_stream(response, fout)
+                except Exception:
+                    self._record_attempt(sent, None)
+                    raise
+                self._record_attempt(sent, response)
+                if response.status_code != 200:
+                    return response
+                fout.path = self._note_path(now, note_id)
+                await fout.finalize(note_id = note_id, model_id = model_id)
+            return response
         
+        response = await self._retry_policy.run(attempt, breaker = self._breaker)
+        end = time.monotonic_ns()
+        if response is None:
+            return None
+        elif response.status_code != 200:
+            logger.error(f"Error sending request: {response.status_code}")
+            return None
+        logger.info(f"Stream finished in {(end - start) / 1e9:.3f} seconds")
+
         logger.info(
             "Saved note to file: {file_path}",
-            file_path = str(path)
+            file_path = str(fout.path)
         )
+        return fout.path
+    
+    @staticmethod
+    async def _consume_stream(response: httpx.Response, fout: StreamFormatOutput) -> tuple[str, str]:
+        """
+        Read NDJSON or SSE (`data: {...}`) chunks and forward them to `fout`.
+        """
+        note_id: str = ""
+        model_id: str = ""
+        async for line in response.aiter_lines():
+            line = line.strip()
+            if line.startswith("data:"):
+                line = line[5:].lstrip()
+            if not line.startswith("{"):
+                # 空行、SSE 注释/事件行与 [DONE] 标记
+                continue
+            chunk = orjson.loads(line)
+            note_id = chunk.get("id") or note_id
+            model_id = chunk.get("model_id") or model_id
+            await fout.write_reasoning(chunk.get("reasoning_content") or "")
+            await fout.write_content(chunk.get("content") or "")
+        return note_id, model_id
+    
+    async def save_note(
+            self,
+            response: NoteResponse,
+            reference_context_user_id: str | None = None,
+            time: datetime | None = None,
+        ) -> asyncio.Future | None:
+        """
+        Save a note with the configured storage backend.
+
+        For file storage the write is queued to the background writer and the
+        returned future resolves once the file is on disk.
+        """
+        now = time or datetime.now()
+        if self._config.storage.backend == StorageBackend.SEGMENTS:
+            await self._append_segment(response, now, reference_context_user_id)
+            return None
+        if self._config.storage.backend == StorageBackend.SQLITE:
+            await self._insert_sqlite(response, now, reference_context_user_id)
+            return None
+        if self._config.dedup:
+            return await self._save_manifest(response, now, reference_context_user_id)
+        path = self._note_path(now, response.id)
+        fout = FormatOutput(
+            output_format = self._config.output_format,
+            path = path,
+            time = now,
+            reference_context_user_id = reference_context_user_id,
+            template = (
+                compile_template(self._config.output_template)
+                if self._config.output_template is not None else None
+            ),
+        )
+        data = await fout.render_async(response = response)
+        # 写入由后台线程完成，网络 Worker 不等待磁盘
+        written = await note_writer.submit(
+            with_suffix(path, self._config.compression),
+            data,
+            self._config.compression,
+            self._config.compression_level,
+        )
+        written.add_done_callback(self._log_saved)
+        return written
+    
+    @staticmethod
+    def _log_saved(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is None:
+            logger.info(
+                "Saved note to file: {file_path}",
+                file_path = str(future.result())
+            )
+    
+    async def _save_manifest(
+            self,
+            response: NoteResponse,
+            now: datetime,
+            reference_context_user_id: str | None,
+        ) -> asyncio.Future:
+        store = blob_stores.get(Path(self._config.output_dir) / "blobs")
+        data = await build_manifest(
+            note_fields(response, now, reference_context_user_id),
+            store,
+            self._config.output_format,
+            self._config.output_template,
+            self._config.output_file_suffix,
+            self._config.compression,
+            self._config.compression_level,
+        )
+        written = await note_writer.submit(self._note_path(now, response.id, MANIFEST_SUFFIX), data)
+        written.add_done_callback(self._log_saved)
+        return written
+    
+    async def _append_segment(self, response: NoteResponse, now: datetime, reference_context_user_id: str | None):
+        log = segment_logs.get(
+            Path(self._config.output_dir) / "segments",
+            self._config.storage.segment_max_bytes,
+        )
+        segment, offset, _ = await log.append(
+            response.id,
+            note_fields(response, now, reference_context_user_id),
+        )
+        logger.info(
+            "Appended note to segment {segment} at {offset} in {path}",
+            segment = segment,
+            offset = offset,
+            path = str(log.directory),
+        )
+    
+    async def _insert_sqlite(self, response: NoteResponse, now: datetime, reference_context_user_id: str | None):
+        store = sqlite_stores.get(
+            self._config.storage.sqlite_file or Path(self._config.output_dir) / "notes.db",
+            self._config.storage.sqlite_batch_size,
+        )
+        await store.add(note_fields(response, now, reference_context_user_id))
+        logger.info(
+            "Saved note to database: {path}",
+            path = str(store.path),
+        )
+    
+    async def _save_spooled(self, outbox: Outbox, entry: OutboxEntry, response: NoteResponse) -> asyncio.Future | None:
+        """
+        Save a spooled response and drop it from the outbox once it is stored.
+
+        Returns the background write's future, if the note was queued to the writer.
+        """
+        try:
+            written = await self.save_note(
+                response = response,
+                reference_context_user_id = entry.reference_context_user_id,
+                time = entry.time,
+            )
+        except Exception:
+            logger.error(f"Failed to save note {response.id}, kept in outbox: {entry.path}")
+            raise
+        if written is None:
+            outbox.done(entry)
+            return None
+
+        def on_written(future: asyncio.Future):
+            if not future.cancelled() and future.exception() is None:
+                outbox.done(entry)
+            else:
+                logger.error(f"Failed to write note {response.id}, kept in outbox: {entry.path}")
+        written.add_done_callback(on_written)
+        return written
+    
+    async def replay_outbox(self) -> int:
+        """
+        Save responses spooled by a previous run that were never saved.
+
+        Only entries spooled under this core's owner are replayed, once per
+        process. Returns the number of replayed notes.
+        """
+        outbox = outboxes.get(self._config.output_dir)
+        entries = await outbox.claim_pending(self._owner)
+        count = 0
+        for entry in entries:
+            try:
+                response = self._parse_response(entry.body)
+            except ValidationError:
+                logger.error(f"Invalid response in outbox entry, moving it aside: {entry.path}")
+                outbox.reject(entry)
+                continue
+            logger.info(f"Replaying note {response.id} from outbox")
+            try:
+                await self._save_spooled(outbox, entry, response)
+            except Exception:
+                continue
+            count += 1
+        return count
+    
+    async def _release(self, server: ServerConfig):
+        """
+        Release a pooled client, or hand it to the running generation to release when it ends.
+        """
+        if self._runs:
+            self._retired.append(server)
+            return
+        await client_pool.release(server)
     
     async def close(self):
-        await self._client.aclose()
+        """
+        Release the HTTP client. A generation still in progress keeps it open until it finishes.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        await self._release(self._config.server)
+        if not self._runs:
+            self._client = None
     
     async def __aenter__(self):
         return self
@@ -127,19 +461,56 @@ class NoteCore:
         await self.close()
     
     
-    async def timer_loop(self):
-        async def create_note():
-            user_id_list = await self.get_user_id_list()
-            reference_context_user_id = random.choice(user_id_list)
-            logger.info(f"Using reference context userid: {reference_context_user_id}")
-            response = await self.send_request(reference_context_user_id)
-            if response is None:
+    async def create_note(self) -> bool:
+        """
+        Generate and save one note. Returns whether a note was saved.
+        """
+        self._runs += 1
+        try:
+            return await self._create_note()
+        finally:
+            self._runs -= 1
+            if not self._runs:
+                retired, self._retired = self._retired, []
+                for server in retired:
+                    await client_pool.release(server)
+                if self._closed:
+                    self._client = None
+    
+    async def _create_note(self) -> bool:
+        await self.load_prompt()
+        reference_context_user_id = await self.pick_reference_user_id()
+        if reference_context_user_id is None:
+            logger.error("No userid available")
+            return False
+        logger.info(f"Using reference context userid: {reference_context_user_id}")
+        if self._config.stream:
+            if await self.stream_note(reference_context_user_id) is None:
                 logger.error("Request failed")
-            else:
-                await self.save_note(
-                    response = response,
-                    reference_context_user_id = reference_context_user_id
-                )
-        
-        timer = Timer(create_note)
-        await timer.start(run_once_first = True)
\ No newline at end of file
+                return False
+            return True
+        response = await self._post(reference_context_user_id)
+        if response is None or response.status_code != 200:
+            logger.error("Request failed")
+            return False
+        # 先将原始响应落盘，解析或保存失败时不会丢失已生成的内容
+        outbox = outboxes.get(self._config.output_dir)
+        entry = await outbox.put(response.content, reference_context_user_id, datetime.now(), self._owner)
+        try:
+            note = self._parse_response(response.content)
+        except ValidationError:
+            # 原始响应保留在 .invalid 文件中，不会在下次启动时重放
+            outbox.reject(entry)
+            raise
+        written = await self._save_spooled(outbox, entry, note)
+        if written is not None:
+            # 笔记落盘后才算成功；写入与其他 Worker 的笔记一起分批提交
+            try:
+                await written
+            except Exception:
+                return False
+        return True
+    
+    async def timer_loop(self):
+        timer = Timer(self.create_note)
+        await timer.start(run_once_first = True)
@@ -0,0 +1,51 @@
+import string
+from functools import lru_cache
+from typing import Any
+
+class NoteTemplate:
+    """
+    User-defined note layout using `str.format` fields.
+
+    Available fields: `note_id` (alias `request_id`), `time`, `model_id`,
+    `reference_context_user_id`, `reasoning_content` and `answer`.
+    """
+
+    FIELDS = frozenset({
+        "note_id",
+        "request_id",
+        "time",
+        "model_id",
+        "reference_context_user_id",
+        "reasoning_content",
+        "answer",
+    })
+
+    def __init__(self, source: str):
+        for _, field_name, _, _ in string.Formatter().parse(source):
+            if field_name is None:
+                continue
+            name = field_name.split(".", 1)[0].split("[", 1)[0]
+            if name not in self.FIELDS:
+                raise ValueError(f"Unknown template field: {field_name}")
+        self._source = source
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    def render(self, fields: dict[str, Any]) -> bytes:
+        return self._source.format_map(
+            {
+                "note_id": fields["Note ID"],
+                "request_id": fields["Note ID"],
+                "time": fields["Time"],
+                "model_id": fields["Model ID"],
+                "reference_context_user_id": fields["Reference Context User ID"],
+                "reasoning_content": fields["CoT"],
+                "answer": fields["Answer"],
+            }
+        ).encode("utf-8")
+
+@lru_cache(maxsize = None)
+def compile_template(source: str) -> NoteTemplate:
+    return NoteTemplate(source)
@@ -0,0 +1,166 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from loguru import logger
+from ._config import Compression
+from ._compression import compress
+from ._atomic import fsync_dir
+
+# 新文件的 fdatasync 同样会写入读取所需的元数据（文件大小）
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+class NoteWriter:
+    """
+    Background writer for rendered note files.
+
+    Notes are queued on the event loop and written in batches by one
+    dedicated thread. A batch is group-committed: every file is written to
+    a temp file and fsynced, then the files are renamed into place and each
+    directory touched is fsynced once for the whole batch. `submit` waits
+    while the queue is full, so workers slow down instead of piling up
+    notes in memory when the disk cannot keep up.
+    """
+
+    def __init__(self, max_queue: int = 256, batch_size: int = 32, fsync: bool = True):
+        self._max_queue = max_queue
+        self._batch_size = batch_size
+        self._fsync = fsync
+        self._queue: asyncio.Queue[tuple[Path, bytes, Compression, int | None, asyncio.Future]] | None = None
+        self._task: asyncio.Task | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        # 已确认存在的目录，避免每条笔记都检查一次
+        self._known_dirs: set[Path] = set()
+
+    def configure(self, max_queue: int = 256, batch_size: int = 32, fsync: bool = True):
+        self._max_queue = max_queue
+        self._batch_size = batch_size
+        self._fsync = fsync
+
+    @property
+    def pending(self) -> int:
+        return 0 if self._queue is None else self._queue.qsize()
+
+    def _start(self):
+        self._queue = asyncio.Queue(maxsize = self._max_queue)
+        self._executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "note-writer")
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(
+            self,
+            path: Path,
+            data: bytes,
+            compression: Compression = Compression.NONE,
+            compression_level: int | None = None,
+        ) -> asyncio.Future:
+        """
+        Queue a note file. Returns a future resolved once the file is on disk.
+
+        Compression, if any, runs on the writer thread.
+        """
+        if self._task is None or self._task.done():
+            self._start()
+        future = asyncio.get_running_loop().create_future()
+        if self._queue.full():
+            logger.warning(f"Note writer queue is full ({self._max_queue}), waiting for disk")
+        await self._queue.put((path, data, compression, compression_level, future))
+        return future
+
+    async def write(
+            self,
+            path: Path,
+            data: bytes,
+            compression: Compression = Compression.NONE,
+            compression_level: int | None = None,
+        ):
+        """
+        Queue a note file and wait until it is written.
+        """
+        await (await self.submit(path, data, compression, compression_level))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                errors = await loop.run_in_executor(
+                    self._executor,
+                    self._write_batch,
+                    [item[:-1] for item in batch],
+                )
+            except Exception as e:
+                errors = [e] * len(batch)
+            for (path, *_, future), error in zip(batch, errors):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(path)
+                else:
+                    logger.error(f"Failed to write note {path}: {error}")
+                    future.set_exception(error)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_batch(self, batch: list[tuple[Path, bytes, Compression, int | None]]) -> list[Exception | None]:
+        errors: list[Exception | None] = [None] * len(batch)
+        temps: dict[int, Path] = {}
+        for i, (path, data, compression, level) in enumerate(batch):
+            try:
+                temps[i] = self._write_temp(path, compress(data, compression, level), i)
+            except Exception as e:
+                errors[i] = e
+        dirs = {batch[i][0].parent for i in temps}
+        for i, tmp in temps.items():
+            try:
+                os.replace(tmp, batch[i][0])
+            except Exception as e:
+                tmp.unlink(missing_ok = True)
+                errors[i] = e
+        if self._fsync:
+            # 目录项整批只 fsync 一次，而不是每个文件一次
+            for directory in dirs:
+                fsync_dir(directory)
+        return errors
+
+    def _write_temp(self, path: Path, data: bytes, n: int = 0) -> Path:
+        directory = path.parent
+        if directory not in self._known_dirs:
+            directory.mkdir(parents = True, exist_ok = True)
+            self._known_dirs.add(directory)
+        # 同一批中可能有同名笔记，临时文件按序号区分
+        tmp = directory / f".{path.name}.{n}.tmp"
+        try:
+            f = open(tmp, "wb")
+        except FileNotFoundError:
+            # 目录在缓存后被删除
+            directory.mkdir(parents = True, exist_ok = True)
+            f = open(tmp, "wb")
+        try:
+            with f:
+                f.write(data)
+                if self._fsync:
+                    f.flush()
+                    _fdatasync(f.fileno())
+        except BaseException:
+            tmp.unlink(missing_ok = True)
+            raise
+        return tmp
+
+    async def close(self):
+        """
+        Write everything still queued, then stop the writer thread.
+        """
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.join()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions = True)
+        self._task = None
+        self._queue = None
+        self._executor.shutdown(wait = True)
+        self._executor = None
+
+note_writer = NoteWriter()
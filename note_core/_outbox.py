@@ -0,0 +1,133 @@
+import os
+import uuid
+import asyncio
+import orjson
+from pathlib import Path
+from datetime import datetime
+from loguru import logger
+from ._registry import PathRegistry
+from ._atomic import atomic_write
+
+class OutboxEntry:
+    """
+    One spooled completion: the raw response body and what is needed to save it.
+    """
+
+    __slots__ = ("path", "reference_context_user_id", "time", "body", "owner")
+
+    def __init__(
+            self,
+            path: Path,
+            reference_context_user_id: str | None,
+            time: datetime,
+            body: bytes,
+            owner: str | None = None,
+        ):
+        self.path = path
+        self.reference_context_user_id = reference_context_user_id
+        self.time = time
+        self.body = body
+        self.owner = owner
+
+class Outbox:
+    """
+    Durable spool of generated responses that have not been saved yet.
+
+    Each entry is one file: a JSON header line followed by the raw response
+    body. It is fsynced before the response is parsed and removed once the
+    note is on disk, so a failed save can be replayed without asking the
+    server to generate the note again.
+
+    Entries record their owner (the config that generated them) and are
+    only replayed by that owner, with its format and storage settings.
+    """
+
+    SUFFIX = ".entry"
+
+    def __init__(self, directory: str | os.PathLike):
+        self._directory = Path(directory)
+        self._claimed: set[str | None] = set()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    async def put(
+            self,
+            body: bytes,
+            reference_context_user_id: str | None,
+            time: datetime,
+            owner: str | None = None,
+        ) -> OutboxEntry:
+        path = self._directory / f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex}{self.SUFFIX}"
+        header = orjson.dumps(
+            {
+                "owner": owner,
+                "reference_context_user_id": reference_context_user_id,
+                "time": time.isoformat(),
+            },
+            option = orjson.OPT_APPEND_NEWLINE,
+        )
+        await asyncio.to_thread(atomic_write, path, header + body)
+        return OutboxEntry(path, reference_context_user_id, time, body, owner)
+
+    def done(self, entry: OutboxEntry):
+        entry.path.unlink(missing_ok = True)
+
+    def reject(self, entry: OutboxEntry):
+        """
+        Move an entry whose body cannot be parsed aside, so it is not replayed again.
+        """
+        self._quarantine(entry.path)
+
+    @staticmethod
+    def _quarantine(path: Path):
+        try:
+            os.replace(path, path.with_name(f"{path.name}.invalid"))
+        except FileNotFoundError:
+            pass
+
+    def _read(self, path: Path) -> OutboxEntry | None:
+        data = path.read_bytes()
+        header, sep, body = data.partition(b"\n")
+        try:
+            meta = orjson.loads(header)
+            time = datetime.fromisoformat(meta["time"])
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            return None
+        if not sep:
+            return None
+        return OutboxEntry(path, meta.get("reference_context_user_id"), time, body, meta.get("owner"))
+
+    def _pending(self, owner: str | None) -> list[OutboxEntry]:
+        if not self._directory.exists():
+            return []
+        entries: list[OutboxEntry] = []
+        for path in sorted(self._directory.glob(f"*{self.SUFFIX}")):
+            entry = self._read(path)
+            if entry is None:
+                logger.warning(f"Invalid outbox entry, moving it aside: {path}")
+                self._quarantine(path)
+                continue
+            if entry.owner == owner:
+                entries.append(entry)
+        return entries
+
+    async def claim_pending(self, owner: str | None = None) -> list[OutboxEntry]:
+        """
+        Entries of `owner` left over from a previous run. Returned once per owner and process.
+        """
+        if owner in self._claimed:
+            return []
+        self._claimed.add(owner)
+        return await asyncio.to_thread(self._pending, owner)
+
+class OutboxRegistry(PathRegistry[Outbox]):
+    """
+    One outbox per output directory, kept in its `.outbox` subdirectory.
+    """
+
+    def _normalize(self, output_dir: str | os.PathLike) -> Path:
+        return super()._normalize(Path(output_dir) / ".outbox")
+
+outboxes = OutboxRegistry(Outbox)
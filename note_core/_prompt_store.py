@@ -0,0 +1,66 @@
+import os
+import sys
+import asyncio
+import aiofiles
+import orjson
+from pathlib import Path
+from loguru import logger
+
+class Prompt:
+    """
+    One loaded prompt file: the interned text and its JSON-encoded form.
+    """
+
+    __slots__ = ("path", "text", "json", "mtime_ns", "size", "version")
+
+    def __init__(self, path: Path, text: str, mtime_ns: int, size: int, version: int):
+        self.path = path
+        self.text = text
+        # 预先编码好的 JSON 字符串（含引号），可直接拼接进请求体
+        self.json: bytes = orjson.dumps(text)
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.version = version
+
+class PromptStore:
+    """
+    Process-wide prompt cache.
+
+    Each distinct file is read once and shared by every worker using it;
+    a changed mtime or size makes the next lookup reload it.
+    """
+
+    def __init__(self):
+        self._prompts: dict[Path, Prompt] = {}
+        self._locks: dict[Path, asyncio.Lock] = {}
+        self._version: int = 0
+
+    async def get(self, prompt_file: str | os.PathLike) -> Prompt:
+        path = Path(prompt_file).resolve()
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            logger.error(f"Prompt file not found: {prompt_file}")
+            raise FileNotFoundError(f"Prompt file not found: {prompt_file}") from None
+
+        prompt = self._prompts.get(path)
+        if prompt is not None and (prompt.mtime_ns, prompt.size) == (stat.st_mtime_ns, stat.st_size):
+            return prompt
+
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            prompt = self._prompts.get(path)
+            if prompt is not None and (prompt.mtime_ns, prompt.size) == (stat.st_mtime_ns, stat.st_size):
+                return prompt
+            logger.info(f"Load prompt from {prompt_file}")
+            async with aiofiles.open(path, "r", encoding="utf-8") as f:
+                text = sys.intern(await f.read())
+            self._version += 1
+            prompt = Prompt(path, text, stat.st_mtime_ns, stat.st_size, self._version)
+            self._prompts[path] = prompt
+            return prompt
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+prompt_store = PromptStore()
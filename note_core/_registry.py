@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+from typing import Any, Callable, Generic, Hashable, Iterator, TypeVar
+from loguru import logger
+from ._config import ServerConfig
+
+T = TypeVar("T")
+
+class Registry(Generic[T]):
+    """
+    Process-wide registry handing out one shared object per key.
+
+    Subclasses define how a key is derived; `factory` builds the object the
+    first time a key is requested.
+    """
+
+    def __init__(self, factory: Callable[..., T]):
+        self._factory = factory
+        self._items: dict[Hashable, T] = {}
+
+    def key(self, source: Any) -> Hashable:
+        raise NotImplementedError
+
+    def _normalize(self, source: Any) -> Any:
+        return source
+
+    def get(self, source: Any, *args, **kwargs) -> T:
+        source = self._normalize(source)
+        key = self.key(source)
+        item = self._items.get(key)
+        if item is None:
+            item = self._factory(source, *args, **kwargs)
+            self._items[key] = item
+        return item
+
+    def items(self) -> Iterator[tuple[Hashable, T]]:
+        return iter(list(self._items.items()))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def close(self):
+        """
+        Close every object that has a `close` method and forget all of them.
+        """
+        for item in self._items.values():
+            close = getattr(item, "close", None)
+            if close is not None:
+                close()
+        self._items.clear()
+
+class ServerRegistry(Registry[T]):
+    """
+    Registry keyed by `(protocol, host, port)` of a `ServerConfig`.
+
+    With `settings`, the shared object is built from `settings(server)`.
+    When a later config for the same server carries different settings,
+    a warning is logged and the object is reconfigured in place, so the
+    most recently started or reloaded config wins for every worker.
+    """
+
+    def __init__(
+            self,
+            factory: Callable[..., T],
+            settings: Callable[[ServerConfig], Any] | None = None,
+            name: str = "",
+        ):
+        super().__init__(factory)
+        self._settings_of = settings
+        self._name = name
+        self._settings: dict[Hashable, Any] = {}
+
+    def key(self, source: ServerConfig) -> Hashable:
+        return source.key
+
+    def get(self, source: ServerConfig, *args, **kwargs) -> T:
+        item = super().get(source, *args, **kwargs)
+        if self._settings_of is None:
+            return item
+        settings = self._settings_of(source)
+        current = self._settings.setdefault(source.key, settings)
+        if current != settings:
+            logger.warning(
+                "{name} settings for {host}:{port} differ between configs, applying the latest: {settings}",
+                name = self._name,
+                host = source.host,
+                port = source.port,
+                settings = settings,
+            )
+            item.reconfigure(settings)
+            self._settings[source.key] = settings
+        return item
+
+    def close(self):
+        super().close()
+        self._settings.clear()
+
+class PathRegistry(Registry[T]):
+    """
+    Registry keyed by resolved filesystem path.
+    """
+
+    def _normalize(self, source: str | os.PathLike) -> Path:
+        return Path(source).resolve()
+
+    def key(self, source: Path) -> Hashable:
+        return source
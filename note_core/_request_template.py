@@ -0,0 +1,33 @@
+import orjson
+from ._config import Config
+from ._prompt_store import Prompt
+
+class CompletionTemplate:
+    """
+    Pre-serialized body of `/chat/completion/{namespace}` requests.
+
+    Everything except `load_from_user_id` is encoded once; rendering only
+    splices the encoded user ID between two constant byte strings.
+    """
+
+    HEADERS = {"Content-Type": "application/json"}
+
+    def __init__(self, config: Config, prompt: Prompt, stream: bool = False):
+        self.prompt_version = prompt.version
+        self.url = (
+            f"{config.server.protocol.value}://"
+            f"{config.server.host}:{config.server.port}"
+            f"/chat/completion/{config.namespace}"
+        )
+        self._prefix = (
+            b'{"message":' + prompt.json +
+            b',"cross_user_data_routing":{"context":{"load_from_user_id":'
+        )
+        self._suffix = (
+            b'}},"save_context":false,"user_info":' +
+            orjson.dumps(config.user_info.model_dump(exclude_none = True)) +
+            (b',"stream":true}' if stream else b'}')
+        )
+
+    def render(self, reference_context_user_id: str | None = None) -> bytes:
+        return self._prefix + orjson.dumps(reference_context_user_id) + self._suffix
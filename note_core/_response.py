@@ -1,3 +1,4 @@
+from functools import cached_property
 from pydantic import BaseModel, Field
 from ._content_unit import ContentUnit
 from ._content_role import ContentRole
@@ -15,18 +16,20 @@ class NoteResponse(BaseModel):
     create_time: int = 0
     finish_reason_cause: str = ""
 
-    @property
-    def reasoning_content(self) -> str:
-        buffer: list[str] = []
+    @cached_property
+    def contents_by_role(self) -> dict[ContentRole, list[str]]:
+        """
+        Context contents grouped by role, built in a single pass and cached.
+        """
+        partitions: dict[ContentRole, list[str]] = {}
         for content in self.context.context_list:
-            if content.role == ContentRole.USER:
-                buffer.append(content.content)
-        return "\n\n".join(buffer)
+            partitions.setdefault(content.role, []).append(content.content)
+        return partitions
+
+    @cached_property
+    def reasoning_content(self) -> str:
+        return "\n\n".join(self.contents_by_role.get(ContentRole.USER, ()))
     
-    @property
-    def content(self):
-        buffer: list[str] = []
-        for content in self.context.context_list:
-            if content.role == ContentRole.ASSISTANT:
-                buffer.append(content.content)
-        return "\n\n".join(buffer)
+    @cached_property
+    def content(self) -> str:
+        return "\n\n".join(self.contents_by_role.get(ContentRole.ASSISTANT, ()))
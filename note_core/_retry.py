@@ -0,0 +1,118 @@
+import httpx
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, TypeVar
+from loguru import logger
+from ._config import Config, RetryConfig, BackoffStrategy, JitterMode
+from ._circuit_breaker import CircuitBreaker
+
+T = TypeVar("T")
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed request is retried.
+
+    Subclass and override `backoff`, `is_retryable_exception` or
+    `is_retryable_result` to plug in a different policy.
+    """
+
+    def __init__(self, retry_times: int, retry_interval: float, config: RetryConfig | None = None):
+        self._retry_times = max(1, retry_times)
+        self._retry_interval = retry_interval
+        self._config = config or RetryConfig()
+        self._retryable_status_codes = frozenset(self._config.retryable_status_codes)
+
+    @classmethod
+    def from_config(cls, config: Config):
+        return cls(
+            retry_times = config.retry_times,
+            retry_interval = config.retry_interval,
+            config = config.retry,
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before retry number `attempt` (starting at 1).
+        """
+        if self._config.backoff == BackoffStrategy.CONSTANT:
+            delay = self._retry_interval
+        elif self._config.backoff == BackoffStrategy.LINEAR:
+            delay = self._retry_interval * attempt
+        else:
+            delay = self._retry_interval * self._config.multiplier ** (attempt - 1)
+        delay = min(delay, self._config.max_interval)
+
+        if self._config.jitter == JitterMode.FULL:
+            delay = random.uniform(0, delay)
+        elif self._config.jitter == JitterMode.EQUAL:
+            delay = delay / 2 + random.uniform(0, delay / 2)
+        return delay
+
+    def is_retryable_exception(self, exc: BaseException) -> bool:
+        return isinstance(exc, httpx.TransportError)
+
+    def is_retryable_result(self, result: Any) -> bool:
+        if isinstance(result, httpx.Response):
+            return result.status_code in self._retryable_status_codes
+        return False
+
+    def _retry_after(self, result: Any) -> float | None:
+        if isinstance(result, httpx.Response):
+            value = result.headers.get("Retry-After")
+            if value is not None:
+                try:
+                    return min(float(value), self._config.max_interval)
+                except ValueError:
+                    return None
+        return None
+
+    async def run(
+            self,
+            func: Callable[[], Awaitable[T]],
+            breaker: CircuitBreaker | None = None,
+        ) -> T | None:
+        """
+        Call `func` until it succeeds or the policy gives up.
+
+        Returns the last result (which may be a retryable error response),
+        or None if no attempt produced a result.
+        """
+        result: T | None = None
+        slept: float = 0.0
+        for attempt in range(self._retry_times):
+            if attempt > 0:
+                delay = self.backoff(attempt)
+                retry_after = self._retry_after(result)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if self._config.budget is not None and slept + delay > self._config.budget:
+                    logger.warning("Retry budget exhausted")
+                    break
+                await asyncio.sleep(delay)
+                slept += delay
+                logger.info(f"Retrying ({attempt + 1}/{self._retry_times})...")
+
+            if breaker is not None and not breaker.allow():
+                logger.warning("Circuit breaker is open, skipping request")
+                break
+
+            try:
+                result = await func()
+            except Exception as e:
+                if not self.is_retryable_exception(e):
+                    raise
+                if breaker is not None:
+                    breaker.record_failure()
+                logger.error(f"Request failed: {e}")
+                continue
+
+            if self.is_retryable_result(result):
+                if breaker is not None:
+                    breaker.record_failure()
+                logger.error(f"Request failed with status: {result.status_code}")
+                continue
+
+            if breaker is not None:
+                breaker.record_success()
+            return result
+        return result
@@ -0,0 +1,144 @@
+import bisect
+import random
+import datetime
+from ._config import ScheduleConfig, TimeWindow
+from ._load_profile import LoadProfile
+
+DAY_SECONDS = 24 * 3600
+
+def _seconds(value: datetime.time) -> int:
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+class RunPlanner:
+    """
+    Draws run times inside the configured daily time windows.
+
+    Each day gets `runs_per_day` random times. A window's chance of being
+    picked is proportional to its weight times its length. With a load
+    profile, hours in which the server was slow or failing are picked less.
+    """
+
+    def __init__(
+            self,
+            config: ScheduleConfig,
+            profile: LoadProfile | None = None,
+            rng: random.Random | None = None,
+        ):
+        self._config = config
+        self._profile = profile
+        self._rng = rng or random
+        self._segments = self._build_segments(config.windows)
+        self._pending: list[datetime.datetime] = []
+        self._planned_day: datetime.date | None = None
+
+    @staticmethod
+    def _build_segments(windows: list[TimeWindow]) -> list[tuple[int, int, float]]:
+        """
+        Split the windows into `(start, end, weight)` second ranges that never
+        cross midnight or an hour boundary.
+        """
+        ranges: list[tuple[int, int, float]] = []
+        for window in windows or [TimeWindow()]:
+            if window.weight <= 0:
+                continue
+            start = _seconds(window.start)
+            end = _seconds(window.end)
+            if end <= start:
+                ranges.append((start, DAY_SECONDS, window.weight))
+                if end > 0:
+                    ranges.append((0, end, window.weight))
+            else:
+                ranges.append((start, end, window.weight))
+
+        segments: list[tuple[int, int, float]] = []
+        for start, end, weight in ranges:
+            while start < end:
+                boundary = min(end, (start // 3600 + 1) * 3600)
+                segments.append((start, boundary, weight))
+                start = boundary
+        if not segments:
+            raise ValueError("Schedule has no usable time window")
+        return segments
+
+    def segment_weights(self) -> list[float]:
+        """
+        Relative weight of each segment.
+        """
+        if self._profile is None:
+            return [(end - start) * weight for start, end, weight in self._segments]
+        hour_weights = self._profile.hour_weights(self._config.load_bias)
+        return [
+            (end - start) * weight * hour_weights[start // 3600]
+            for start, end, weight in self._segments
+        ]
+
+    def draw_day(self, day: datetime.date) -> list[datetime.datetime]:
+        weights = self.segment_weights()
+        cumulative: list[float] = []
+        total: float = 0.0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+
+        midnight = datetime.datetime.combine(day, datetime.time())
+        times: list[datetime.datetime] = []
+        for _ in range(max(1, self._config.runs_per_day)):
+            index = bisect.bisect_right(cumulative, self._rng.uniform(0, total))
+            start, end, _ = self._segments[min(index, len(self._segments) - 1)]
+            seconds = self._rng.randint(start, end - 1)
+            times.append(midnight + datetime.timedelta(seconds = seconds))
+        times.sort()
+        return times
+
+    def _window_length(self, opening: int) -> int:
+        """
+        Length in seconds of the contiguous window that opens at `opening`.
+        """
+        ends: dict[int, int] = {}
+        for start, end, _ in self._segments:
+            ends[start] = max(end, ends.get(start, start))
+        length = 0
+        position = opening
+        while position in ends and length < DAY_SECONDS:
+            end = ends[position]
+            length += end - position
+            position = end % DAY_SECONDS
+        return max(1, min(length, DAY_SECONDS))
+
+    def earliest_allowed(self, when: datetime.datetime) -> datetime.datetime:
+        """
+        `when` if it falls inside a time window, otherwise a random time in
+        the next window.
+        """
+        seconds = _seconds(when.time())
+        wait: int | None = None
+        for start, end, _ in self._segments:
+            if start <= seconds < end:
+                return when
+            delta = (start - seconds) % DAY_SECONDS
+            if wait is None or delta < wait:
+                wait = delta
+        # 推迟的运行分散在整个窗口内，避免所有 Worker 在窗口开始的同一秒运行
+        length = self._window_length((seconds + wait) % DAY_SECONDS)
+        wait += self._rng.randint(0, length - 1)
+        return when.replace(microsecond = 0) + datetime.timedelta(seconds = wait)
+
+    def next_time(self) -> datetime.datetime:
+        """
+        Next planned run time after now. Days are planned one at a time,
+        starting from tomorrow.
+        """
+        now = datetime.datetime.now()
+        while True:
+            while self._pending and self._pending[0] <= now:
+                self._pending.pop(0)
+            if self._pending:
+                return self._pending.pop(0)
+
+            tomorrow = now.date() + datetime.timedelta(days = 1)
+            if self._planned_day is None or self._planned_day < tomorrow - datetime.timedelta(days = 1):
+                day = tomorrow
+            else:
+                day = self._planned_day + datetime.timedelta(days = 1)
+            self._planned_day = day
+            self._pending = self.draw_day(day)
@@ -0,0 +1,58 @@
+import os
+import aiofiles
+import orjson
+from datetime import datetime
+from pydantic import BaseModel, Field, ValidationError
+from loguru import logger
+from ._delayed_save import DelayedSave
+
+class ScheduleEntry(BaseModel):
+    next_run: datetime | None = None
+    last_success: datetime | None = None
+
+class ScheduleStateData(BaseModel):
+    jobs: dict[str, ScheduleEntry] = Field(default_factory = dict)
+
+class ScheduleState(DelayedSave):
+    """
+    Persisted next-run and last-success times, keyed by job ID (config path).
+
+    Changes are coalesced and written atomically after `save_delay` seconds.
+    """
+
+    def __init__(self, state_file: str | os.PathLike, save_delay: float = 1.0):
+        super().__init__(state_file, save_delay)
+        self._data = ScheduleStateData()
+
+    async def load(self):
+        if not self._path.exists():
+            return
+        try:
+            async with aiofiles.open(self._path, "rb") as f:
+                self._data = ScheduleStateData(**orjson.loads(await f.read()))
+            logger.info(
+                "Loaded schedule state for {count} jobs from {path}",
+                count = len(self._data.jobs),
+                path = str(self._path),
+            )
+        except (orjson.JSONDecodeError, ValidationError) as e:
+            logger.warning(f"Invalid schedule state, starting fresh: {e}")
+            self._data = ScheduleStateData()
+
+    def get(self, job_id: str) -> ScheduleEntry | None:
+        return self._data.jobs.get(job_id)
+
+    def set_next_run(self, job_id: str, next_run: datetime | None):
+        self._data.jobs.setdefault(job_id, ScheduleEntry()).next_run = next_run
+        self._schedule_save()
+
+    def set_last_success(self, job_id: str, last_success: datetime):
+        self._data.jobs.setdefault(job_id, ScheduleEntry()).last_success = last_success
+        self._schedule_save()
+
+    def discard(self, job_id: str):
+        if self._data.jobs.pop(job_id, None) is not None:
+            self._schedule_save()
+
+    def _dump(self) -> bytes:
+        return orjson.dumps(self._data.model_dump(mode = "json"))
@@ -0,0 +1,184 @@
+import heapq
+import asyncio
+import datetime
+from typing import Any, Awaitable, Callable
+from loguru import logger
+from ._schedule_state import ScheduleState
+
+class Job:
+    def __init__(
+            self,
+            job_id: str,
+            callback: Callable[[], Awaitable[Any]],
+            next_time: Callable[[], datetime.datetime],
+        ):
+        self.job_id = job_id
+        self.callback = callback
+        self.next_time = next_time
+        self.run_at: datetime.datetime | None = None
+        self.running: bool = False
+
+class Scheduler:
+    """
+    Single timer service for every worker.
+
+    Next-fire times live in a min-heap; one task sleeps until the nearest
+    deadline and dispatches due jobs to at most `max_workers` concurrent runs.
+    """
+
+    # 长时间睡眠时定期醒来，以应对系统时间的调整
+    MAX_SLEEP = 3600.0
+
+    def __init__(self, max_workers: int = 16, state: ScheduleState | None = None):
+        self._state = state
+        self._jobs: dict[str, Job] = {}
+        self._heap: list[tuple[float, int, Job]] = []
+        self._counter: int = 0
+        self._slots = asyncio.Semaphore(max_workers)
+        self._wakeup = asyncio.Event()
+        self._running: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    def add(
+            self,
+            job_id: str,
+            callback: Callable[[], Awaitable[Any]],
+            next_time: Callable[[], datetime.datetime],
+            run_at: datetime.datetime | None = None,
+            run_once_first: bool = False,
+            earliest_allowed: Callable[[datetime.datetime], datetime.datetime] | None = None,
+        ) -> Job:
+        """
+        Register a job.
+
+        It first fires at `run_at` if given, otherwise at the persisted next
+        run time, otherwise immediately (`run_once_first`) or at `next_time()`.
+        With `earliest_allowed`, a first run that is due now or was missed
+        is moved to the time it returns.
+        A callback returning `False` is treated as a failed run.
+        """
+        if job_id in self._jobs:
+            raise ValueError(f"Job already scheduled: {job_id}")
+        if run_at is None and self._state is not None:
+            entry = self._state.get(job_id)
+            if entry is not None and entry.next_run is not None:
+                run_at = entry.next_run
+                logger.info(
+                    "{job_id}: resuming persisted schedule",
+                    job_id = job_id,
+                )
+        now = datetime.datetime.now()
+        if run_at is None:
+            run_at = now if run_once_first else next_time()
+        if earliest_allowed is not None:
+            # 首次运行与错过的运行同样只能落在允许的时间窗口内
+            run_at = earliest_allowed(max(run_at, now))
+        job = Job(job_id, callback, next_time)
+        self._jobs[job_id] = job
+        self._push(job, run_at)
+        return job
+
+    def remove(self, job_id: str, forget: bool = False) -> Job | None:
+        """
+        Unregister a job. A run already in progress is allowed to finish.
+
+        With `forget`, its persisted schedule is dropped as well.
+        """
+        job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.run_at = None
+        if forget and self._state is not None:
+            self._state.discard(job_id)
+        return job
+
+    def reschedule(self, job_id: str, run_at: datetime.datetime):
+        job = self._jobs[job_id]
+        if not job.running:
+            self._push(job, run_at)
+
+    def _push(self, job: Job, run_at: datetime.datetime):
+        job.run_at = run_at
+        self._counter += 1
+        heapq.heappush(self._heap, (run_at.timestamp(), self._counter, job))
+        if self._state is not None:
+            self._state.set_next_run(job.job_id, run_at)
+        logger.info(
+            "{job_id}: next run at {next_time}",
+            job_id = job.job_id,
+            next_time = run_at.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        if self._heap[0][2] is job:
+            self._wakeup.set()
+
+    def _is_current(self, timestamp: float, job: Job) -> bool:
+        # 堆中的过期条目（已移除或已重新调度的任务）在弹出时丢弃
+        return (
+            self._jobs.get(job.job_id) is job
+            and job.run_at is not None
+            and job.run_at.timestamp() == timestamp
+        )
+
+    async def run(self):
+        """
+        Run the scheduler until cancelled.
+        """
+        try:
+            while True:
+                while self._heap and not self._is_current(self._heap[0][0], self._heap[0][2]):
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    delay = self.MAX_SLEEP
+                else:
+                    delay = min(self._heap[0][0] - datetime.datetime.now().timestamp(), self.MAX_SLEEP)
+
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout = delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                await self._slots.acquire()
+                # 等待空闲槽位期间堆可能已经变化
+                timestamp, _, job = self._heap[0] if self._heap else (0.0, 0, None)
+                if (
+                    job is None
+                    or not self._is_current(timestamp, job)
+                    or timestamp > datetime.datetime.now().timestamp()
+                ):
+                    self._slots.release()
+                    continue
+                heapq.heappop(self._heap)
+                job.run_at = None
+                job.running = True
+                task = asyncio.create_task(self._dispatch(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+        finally:
+            for task in list(self._running):
+                task.cancel()
+            if self._running:
+                await asyncio.gather(*list(self._running), return_exceptions = True)
+
+    async def _dispatch(self, job: Job):
+        try:
+            result = await job.callback()
+            if result is not False and self._state is not None:
+                self._state.set_last_success(job.job_id, datetime.datetime.now())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("{job_id}: job failed: {error}", job_id = job.job_id, error = e)
+        finally:
+            job.running = False
+            self._slots.release()
+
+        if self._jobs.get(job.job_id) is job:
+            self._push(job, job.next_time())
@@ -0,0 +1,210 @@
+import os
+import struct
+import asyncio
+import threading
+import orjson
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+from loguru import logger
+from ._registry import PathRegistry
+from ._atomic import fsync_dir
+
+class SegmentLog:
+    """
+    Append-only note log made of rotating NDJSON segment files.
+
+    Every segment `NNNNNN.ndjson` has a sidecar `NNNNNN.idx` of compact
+    binary records mapping a note ID to its offset and length in the
+    segment, so a single note is read with one seek instead of a scan.
+    """
+
+    SEGMENT_SUFFIX = ".ndjson"
+    INDEX_SUFFIX = ".idx"
+    # offset, length, note ID 长度，之后紧跟 UTF-8 编码的 note ID
+    RECORD = struct.Struct("<QIH")
+
+    def __init__(self, directory: str | os.PathLike, max_segment_bytes: int = 64 * 1024 * 1024):
+        self._directory = Path(directory)
+        self._max_segment_bytes = max_segment_bytes
+        self._index: dict[str, tuple[int, int, int]] = {}
+        self._segment: int = 0
+        self._segment_size: int = 0
+        self._segment_file: BinaryIO | None = None
+        self._index_file: BinaryIO | None = None
+        self._opened: bool = False
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def _segment_path(self, segment: int) -> Path:
+        return self._directory / f"{segment:06d}{self.SEGMENT_SUFFIX}"
+
+    def _index_path(self, segment: int) -> Path:
+        return self._directory / f"{segment:06d}{self.INDEX_SUFFIX}"
+
+    def _segments(self) -> list[int]:
+        if not self._directory.exists():
+            return []
+        return sorted(
+            int(path.stem)
+            for path in self._directory.iterdir()
+            if path.suffix == self.SEGMENT_SUFFIX and path.stem.isdigit()
+        )
+
+    def _open(self):
+        if self._opened:
+            return
+        self._directory.mkdir(parents = True, exist_ok = True)
+        segments = self._segments()
+        for segment in segments:
+            self._load_index(segment)
+        self._segment = segments[-1] if segments else 1
+        self._open_segment(self._segment)
+        self._opened = True
+        logger.debug(
+            "Opened segment log {path} with {count} notes",
+            path = str(self._directory),
+            count = len(self._index),
+        )
+
+    def _load_index(self, segment: int):
+        """
+        Read a segment's index, re-indexing any lines written after it was last updated.
+        """
+        indexed_end = 0
+        index_path = self._index_path(segment)
+        if index_path.exists():
+            data = index_path.read_bytes()
+            pos = 0
+            while pos + self.RECORD.size <= len(data):
+                offset, length, id_length = self.RECORD.unpack_from(data, pos)
+                end = pos + self.RECORD.size + id_length
+                if end > len(data):
+                    break
+                note_id = data[pos + self.RECORD.size:end].decode("utf-8")
+                self._index[note_id] = (segment, offset, length)
+                indexed_end = max(indexed_end, offset + length)
+                pos = end
+            if pos != len(data):
+                # 截断写了一半的索引记录
+                with open(index_path, "r+b") as f:
+                    f.truncate(pos)
+
+        segment_path = self._segment_path(segment)
+        size = segment_path.stat().st_size
+        if size <= indexed_end:
+            return
+        logger.warning(f"Re-indexing segment {segment_path}")
+        records: list[bytes] = []
+        offset = indexed_end
+        with open(segment_path, "rb") as f:
+            f.seek(indexed_end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    note_id = orjson.loads(line)["Note ID"]
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    note_id = None
+                if note_id is not None:
+                    self._index[str(note_id)] = (segment, offset, len(line))
+                    records.append(self._record(str(note_id), offset, len(line)))
+                offset += len(line)
+        if offset < size:
+            # 写了一半的行，截断后由下一次追加覆盖
+            os.truncate(segment_path, offset)
+        with open(index_path, "ab") as f:
+            f.write(b"".join(records))
+
+    def _record(self, note_id: str, offset: int, length: int) -> bytes:
+        encoded = note_id.encode("utf-8")
+        return self.RECORD.pack(offset, length, len(encoded)) + encoded
+
+    def _open_segment(self, segment: int):
+        self._close_files()
+        self._segment = segment
+        self._segment_file = open(self._segment_path(segment), "ab")
+        self._index_file = open(self._index_path(segment), "ab")
+        self._segment_size = self._segment_file.tell()
+        if not self._segment_size:
+            # 新建的分段文件要让目录项也落盘
+            fsync_dir(self._directory)
+
+    def _close_files(self):
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._segment_file = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def _append(self, note_id: str, line: bytes) -> tuple[int, int, int]:
+        with self._lock:
+            self._open()
+            if self._segment_size and self._segment_size + len(line) > self._max_segment_bytes:
+                self._open_segment(self._segment + 1)
+            offset = self._segment_size
+            self._segment_file.write(line)
+            self._segment_file.flush()
+            # 返回后发件箱条目即被删除，笔记必须已经落盘
+            os.fsync(self._segment_file.fileno())
+            # 先写数据再写索引，崩溃后缺失的索引可从分段文件恢复
+            self._index_file.write(self._record(note_id, offset, len(line)))
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+            self._segment_size += len(line)
+            location = (self._segment, offset, len(line))
+            self._index[note_id] = location
+            return location
+
+    async def append(self, note_id: str, fields: dict[str, Any]) -> tuple[int, int, int]:
+        """
+        Append one note as a JSON line and fsync it. Returns its (segment, offset, length).
+        """
+        line = orjson.dumps(fields, option = orjson.OPT_APPEND_NEWLINE)
+        return await asyncio.to_thread(self._append, note_id, line)
+
+    def _get(self, note_id: str) -> bytes | None:
+        with self._lock:
+            self._open()
+            location = self._index.get(note_id)
+        if location is None:
+            return None
+        segment, offset, length = location
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    async def get(self, note_id: str) -> dict[str, Any] | None:
+        line = await asyncio.to_thread(self._get, note_id)
+        return None if line is None else orjson.loads(line)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        """
+        Iterate over every note in append order.
+        """
+        for segment in self._segments():
+            with open(self._segment_path(segment), "rb") as f:
+                for line in f:
+                    if line.endswith(b"\n"):
+                        yield orjson.loads(line)
+
+    def __contains__(self, note_id: str) -> bool:
+        with self._lock:
+            self._open()
+            return note_id in self._index
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._open()
+            return len(self._index)
+
+    def close(self):
+        with self._lock:
+            self._close_files()
+            self._index.clear()
+            self._opened = False
+
+segment_logs: PathRegistry[SegmentLog] = PathRegistry(SegmentLog)
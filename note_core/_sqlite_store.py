@@ -0,0 +1,242 @@
+import os
+import queue
+import sqlite3
+import asyncio
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Any
+from loguru import logger
+from ._registry import PathRegistry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    note_id TEXT NOT NULL UNIQUE,
+    time TEXT NOT NULL,
+    model_id TEXT,
+    reference_user_id TEXT,
+    cot TEXT NOT NULL DEFAULT '',
+    answer TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS notes_time ON notes(time);
+CREATE INDEX IF NOT EXISTS notes_reference_user_id ON notes(reference_user_id, time);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    cot, answer, content = 'notes', content_rowid = 'id'
+);
+CREATE TRIGGER IF NOT EXISTS notes_ai AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts(rowid, cot, answer) VALUES (new.id, new.cot, new.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts(notes_fts, rowid, cot, answer) VALUES ('delete', old.id, old.cot, old.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_au AFTER UPDATE ON notes BEGIN
+    INSERT INTO notes_fts(notes_fts, rowid, cot, answer) VALUES ('delete', old.id, old.cot, old.answer);
+    INSERT INTO notes_fts(rowid, cot, answer) VALUES (new.id, new.cot, new.answer);
+END;
+"""
+
+INSERT = """
+INSERT INTO notes (note_id, time, model_id, reference_user_id, cot, answer)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(note_id) DO UPDATE SET
+    time = excluded.time,
+    model_id = excluded.model_id,
+    reference_user_id = excluded.reference_user_id,
+    cot = excluded.cot,
+    answer = excluded.answer
+"""
+
+COLUMNS = ("note_id", "time", "model_id", "reference_user_id", "cot", "answer")
+
+def connect(path: str | os.PathLike) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread = False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    return conn
+
+def has_fts(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+    ).fetchone()
+    return row is not None
+
+def search(
+        conn: sqlite3.Connection,
+        text: str | None = None,
+        since: datetime | str | None = None,
+        until: datetime | str | None = None,
+        reference_user_id: str | None = None,
+        limit: int | None = 50,
+    ) -> list[dict[str, Any]]:
+    """
+    Find notes by full-text match on CoT/Answer, time range and reference user.
+
+    `text` uses FTS5 query syntax; without FTS5 it is matched as a substring.
+    Results are ordered newest first.
+    """
+    clauses: list[str] = []
+    params: list[Any] = []
+    if text:
+        if has_fts(conn):
+            clauses.append("notes.id IN (SELECT rowid FROM notes_fts WHERE notes_fts MATCH ?)")
+            params.append(text)
+        else:
+            clauses.append("(notes.cot LIKE ? OR notes.answer LIKE ?)")
+            params.extend((f"%{text}%", f"%{text}%"))
+    if since is not None:
+        clauses.append("notes.time >= ?")
+        params.append(_format_time(since))
+    if until is not None:
+        clauses.append("notes.time < ?")
+        params.append(_format_time(until))
+    if reference_user_id is not None:
+        clauses.append("notes.reference_user_id = ?")
+        params.append(reference_user_id)
+    sql = f"SELECT {', '.join(COLUMNS)} FROM notes"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY notes.time DESC, notes.id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [dict(row) for row in conn.execute(sql, params)]
+
+def _format_time(value: datetime | str) -> str:
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+class SqliteNoteStore:
+    """
+    Note store backed by one SQLite database in WAL mode.
+
+    Inserts are queued to a dedicated writer thread that commits them in
+    batches, so saving a note never runs SQLite on the event loop.
+    """
+
+    def __init__(self, path: str | os.PathLike, batch_size: int = 64):
+        self._path = Path(path)
+        self._batch_size = batch_size
+        self._queue: queue.Queue[tuple[tuple, asyncio.Future, asyncio.AbstractEventLoop] | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._fts: bool = False
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _init_db(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents = True, exist_ok = True)
+        conn = connect(self._path)
+        # 提交返回后发件箱条目即被删除，写入连接每次提交都要落盘
+        conn.execute("PRAGMA synchronous = FULL")
+        conn.executescript(SCHEMA)
+        try:
+            conn.executescript(FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 is not available, full-text search falls back to LIKE: {e}")
+        conn.commit()
+        return conn
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            conn = self._init_db()
+            self._thread = threading.Thread(
+                target = self._run,
+                args = (conn,),
+                name = f"sqlite-writer-{self._path.name}",
+                daemon = True,
+            )
+            self._thread.start()
+            logger.debug(f"Started SQLite writer for {self._path}")
+
+    def _run(self, conn: sqlite3.Connection):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                stop = False
+                while len(batch) < self._batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: list[tuple[tuple, asyncio.Future, asyncio.AbstractEventLoop]]):
+        try:
+            with conn:
+                conn.executemany(INSERT, [row for row, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} notes to {self._path}: {e}")
+            for _, future, loop in batch:
+                loop.call_soon_threadsafe(_set_exception, future, e)
+            return
+        for _, future, loop in batch:
+            loop.call_soon_threadsafe(_set_result, future, None)
+
+    async def add(self, fields: dict[str, Any]):
+        """
+        Queue one note (as produced by `note_fields`) and wait until it is committed.
+        """
+        if self._thread is None:
+            await asyncio.to_thread(self._start)
+        row = (
+            fields["Note ID"],
+            fields["Time"],
+            fields["Model ID"],
+            fields["Reference Context User ID"],
+            fields["CoT"] or "",
+            fields["Answer"] or "",
+        )
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((row, future, loop))
+        await future
+
+    def search(self, *args, **kwargs) -> list[dict[str, Any]]:
+        conn = connect(self._path)
+        try:
+            return search(conn, *args, **kwargs)
+        finally:
+            conn.close()
+
+    def close(self):
+        """
+        Commit queued notes and stop the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+def _set_result(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
+def _set_exception(future: asyncio.Future, exc: BaseException):
+    if not future.done():
+        future.set_exception(exc)
+
+sqlite_stores: PathRegistry[SqliteNoteStore] = PathRegistry(SqliteNoteStore)
@@ -0,0 +1,32 @@
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+class StartupRamp:
+    """
+    Spreads worker startup over `window` seconds.
+
+    Each worker waits for a deterministic offset derived from its key, so a
+    given config always starts at the same point of the window, and at most
+    `max_starting` workers are starting at the same time.
+    """
+
+    def __init__(self, window: float = 0.0, max_starting: int | None = None):
+        self._window = max(0.0, window)
+        self._slots = asyncio.Semaphore(max_starting) if max_starting else None
+
+    def offset(self, key: str) -> float:
+        if not self._window:
+            return 0.0
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size = 8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64 * self._window
+
+    @asynccontextmanager
+    async def starting(self, key: str) -> AsyncIterator[None]:
+        await asyncio.sleep(self.offset(key))
+        if self._slots is None:
+            yield
+            return
+        async with self._slots:
+            yield
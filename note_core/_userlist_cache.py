@@ -0,0 +1,84 @@
+import time
+import httpx
+import asyncio
+from typing import AsyncContextManager, Callable
+from loguru import logger
+from ._registry import ServerRegistry
+from ._userlist_stream import UserIdSnapshot, iter_json_string_array
+
+StreamOpener = Callable[[dict[str, str]], AsyncContextManager[httpx.Response]]
+
+class UserListCache:
+    """
+    Shared cache of a server's context user list.
+
+    Concurrent lookups coalesce into a single in-flight request, fresh
+    entries are served for `ttl` seconds and stale ones are revalidated
+    with `If-None-Match` when the server sent an ETag.
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._value: UserIdSnapshot | None = None
+        self._etag: str | None = None
+        self._fetched_at: float = 0.0
+        self._inflight: asyncio.Task | None = None
+
+    def reconfigure(self, ttl: float):
+        self._ttl = ttl
+
+    @property
+    def fresh(self) -> bool:
+        return self._value is not None and time.monotonic() - self._fetched_at < self._ttl
+
+    def invalidate(self):
+        self._value = None
+        self._etag = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0
+
+    async def get(self, open_stream: StreamOpener) -> UserIdSnapshot:
+        """
+        Return the user list, calling `open_stream(headers)` only when needed.
+        """
+        if self.fresh:
+            return self._value
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._refresh(open_stream))
+            self._inflight.add_done_callback(self._clear_inflight)
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, task: asyncio.Task):
+        if self._inflight is task:
+            self._inflight = None
+        if not task.cancelled():
+            # 避免无人等待时出现 "exception was never retrieved"
+            task.exception()
+
+    async def _refresh(self, open_stream: StreamOpener) -> UserIdSnapshot:
+        headers: dict[str, str] = {}
+        if self._value is not None and self._etag is not None:
+            headers["If-None-Match"] = self._etag
+
+        async with open_stream(headers) as response:
+            if response.status_code == 304 and self._value is not None:
+                logger.debug("Userid list not modified")
+                self._fetched_at = time.monotonic()
+                return self._value
+            response.raise_for_status()
+            snapshot = await UserIdSnapshot.from_stream(
+                iter_json_string_array(response.aiter_bytes())
+            )
+
+        self._value = snapshot
+        self._etag = response.headers.get("ETag")
+        self._fetched_at = time.monotonic()
+        return snapshot
+
+userlist_caches: ServerRegistry[UserListCache] = ServerRegistry(
+    lambda server: UserListCache(server.userlist_cache_ttl),
+    settings = lambda server: server.userlist_cache_ttl,
+    name = "Userlist cache",
+)
@@ -0,0 +1,152 @@
+import random
+import orjson
+from array import array
+from typing import AsyncIterable, AsyncIterator, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_WHITESPACE = b" \t\r\n"
+
+async def iter_json_string_array(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """
+    Incrementally parse a top-level JSON array of strings.
+
+    Items are yielded as soon as they are complete, so the whole body is
+    never held in memory. Numeric items are yielded as their string form.
+    """
+    buffer = bytearray()
+    pos: int = 0
+    started: bool = False
+    expect_item: bool = True
+    finished: bool = False
+
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if finished:
+                raise ValueError("Invalid userid list")
+            if not started:
+                if char != ord("["):
+                    raise ValueError("Invalid userid list")
+                started = True
+                pos += 1
+            elif char == ord("]"):
+                finished = True
+                pos += 1
+            elif char == ord(","):
+                if expect_item:
+                    raise ValueError("Invalid userid list")
+                expect_item = True
+                pos += 1
+            elif not expect_item:
+                raise ValueError("Invalid userid list")
+            elif char == ord('"'):
+                end = _find_string_end(buffer, pos + 1)
+                if end < 0:
+                    break
+                yield orjson.loads(bytes(buffer[pos:end + 1]))
+                expect_item = False
+                pos = end + 1
+            else:
+                end = pos
+                while end < len(buffer) and buffer[end] not in b",]" and buffer[end] not in _WHITESPACE:
+                    end += 1
+                if end >= len(buffer):
+                    # 数字可能被分块截断，等待更多数据
+                    break
+                value = orjson.loads(bytes(buffer[pos:end]))
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError("Invalid userid list")
+                yield str(value)
+                expect_item = False
+                pos = end
+        # 丢弃已经解析过的部分
+        del buffer[:pos]
+        pos = 0
+
+    if not finished:
+        raise ValueError("Invalid userid list")
+
+def _find_string_end(buffer: bytearray, start: int) -> int:
+    """
+    Index of the closing quote of a JSON string, or -1 if it is not buffered yet.
+    """
+    while True:
+        end = buffer.find(b'"', start)
+        if end < 0:
+            return -1
+        backslashes = 0
+        i = end - 1
+        while buffer[i] == ord("\\"):
+            backslashes += 1
+            i -= 1
+        if backslashes % 2 == 0:
+            return end
+        start = end + 1
+
+async def reservoir_sample(items: AsyncIterable[T], k: int = 1, rng: random.Random | None = None) -> list[T]:
+    """
+    Pick `k` items uniformly at random from a stream of unknown length.
+    """
+    rng = rng or random
+    sample: list[T] = []
+    count: int = 0
+    async for item in items:
+        count += 1
+        if len(sample) < k:
+            sample.append(item)
+        else:
+            index = rng.randrange(count)
+            if index < k:
+                sample[index] = item
+    return sample
+
+class UserIdSnapshot:
+    """
+    Compact, array-backed list of user IDs.
+
+    All IDs share one UTF-8 buffer with an offset table, instead of one
+    Python string object per ID.
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+
+    def append(self, user_id: str):
+        self._data += user_id.encode("utf-8")
+        self._offsets.append(len(self._data))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("UserIdSnapshot index out of range")
+        return self._data[self._offsets[index]:self._offsets[index + 1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def choice(self, rng: random.Random | None = None) -> str:
+        if not len(self):
+            raise IndexError("Cannot choose from an empty snapshot")
+        return self[(rng or random).randrange(len(self))]
+
+    def to_list(self) -> list[str]:
+        return list(self)
+
+    @classmethod
+    async def from_stream(cls, items: AsyncIterable[str]):
+        snapshot = cls()
+        async for item in items:
+            snapshot.append(item)
+        return snapshot
@@ -0,0 +1,172 @@
+import os
+from pathlib import Path
+from loguru import logger
+from ._config import Config, OutputFormat
+from ._formatters import get_formatter
+from ._config_loader import ConfigLoader
+from ._config_cache import ConfigCache
+from ._main import NoteCore
+from ._scheduler import Scheduler
+from ._startup import StartupRamp
+from ._run_planner import RunPlanner
+from ._load_profile import load_profiles
+
+class Worker:
+    def __init__(self, path: Path, core: NoteCore, planner: RunPlanner):
+        self.path = path
+        self.core = core
+        self.planner = planner
+
+    @property
+    def job_id(self) -> str:
+        return str(self.path)
+
+class WorkerManager:
+    """
+    Owns the running workers: one `NoteCore` and one scheduler job per config file.
+    """
+
+    def __init__(
+            self,
+            scheduler: Scheduler,
+            ramp: StartupRamp | None = None,
+            config_cache: ConfigCache | None = None,
+        ):
+        self._scheduler = scheduler
+        self._ramp = ramp or StartupRamp()
+        self._config_cache = config_cache
+        self._workers: dict[Path, Worker] = {}
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self._workers
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    @property
+    def paths(self) -> set[Path]:
+        return set(self._workers)
+
+    @property
+    def output_dirs(self) -> set[Path]:
+        return {Path(worker.core.config.output_dir) for worker in self._workers.values()}
+
+    @staticmethod
+    def _planner(config: Config) -> RunPlanner:
+        return RunPlanner(
+            config.schedule,
+            profile = load_profiles.get(config.server) if config.schedule.load_aware else None,
+        )
+
+    @staticmethod
+    def _check_output_format(path: Path, config: Config):
+        # 自定义格式在加载配置时无法检查，在调度前确认已注册，避免生成完成后才失败
+        if config.output_format == OutputFormat.TEMPLATE:
+            return
+        try:
+            get_formatter(config.output_format)
+        except ValueError:
+            raise ValueError(f"Unknown output format {str(config.output_format)!r} in {path}") from None
+
+    async def _load_config(self, path: Path, stat: os.stat_result | None, fail_writes_default: bool) -> Config:
+        if self._config_cache is None:
+            return await ConfigLoader(path).load(fail_writes_default = fail_writes_default)
+
+        stat = stat or path.stat()
+        config = self._config_cache.get(path, stat)
+        if config is not None:
+            logger.debug(f"Loaded config {path} from cache")
+            return config
+        config = await ConfigLoader(path).load(fail_writes_default = fail_writes_default)
+        after = path.stat()
+        # 读取期间文件被修改（或写入了默认配置）时不缓存
+        if (after.st_mtime_ns, after.st_size) == (stat.st_mtime_ns, stat.st_size):
+            self._config_cache.put(path, stat, config)
+        return config
+
+    async def start(
+            self,
+            path: Path,
+            stat: os.stat_result | None = None,
+            fail_writes_default: bool = True,
+        ) -> Worker | None:
+        """
+        Load a config file and schedule its worker.
+
+        With `fail_writes_default`, an unreadable file is replaced by the
+        default config (initial startup only). Otherwise an unreadable or
+        invalid file is logged and skipped, and None is returned.
+        """
+        async with self._ramp.starting(str(path)):
+            try:
+                config = await self._load_config(path, stat, fail_writes_default = fail_writes_default)
+                self._check_output_format(path, config)
+            except Exception as e:
+                if fail_writes_default:
+                    raise
+                logger.error(f"Skipping invalid config {path}: {e}")
+                return None
+            logger.info(f"Worker {path.stem} is running")
+            planner = self._planner(config)
+            core = NoteCore(config, owner = str(path))
+            worker = Worker(path, core, planner)
+            try:
+                await core.load_prompt()
+                try:
+                    replayed = await core.replay_outbox()
+                except Exception as e:
+                    logger.error(f"Failed to replay outbox for {path.stem}: {e}")
+                else:
+                    if replayed:
+                        logger.info(f"Worker {path.stem} replayed {replayed} notes from outbox")
+                self._scheduler.add(
+                    worker.job_id,
+                    core.create_note,
+                    lambda: worker.planner.next_time(),
+                    run_once_first = True,
+                    earliest_allowed = lambda when: worker.planner.earliest_allowed(when),
+                )
+            except BaseException:
+                # 包括启动期间被取消（配置文件被删除）
+                await core.close()
+                raise
+            self._workers[path] = worker
+        return worker
+
+    async def stop(self, path: Path, forget: bool = False):
+        worker = self._workers.pop(path, None)
+        if worker is None:
+            return
+        logger.info(f"Worker {path.stem} stopped")
+        self._scheduler.remove(worker.job_id, forget = forget)
+        if forget and self._config_cache is not None:
+            self._config_cache.discard(path)
+        await worker.core.close()
+
+    async def reload(self, path: Path):
+        """
+        Re-read a changed config file and apply it to the running worker.
+
+        An unreadable or invalid file leaves the current config in place.
+        """
+        worker = self._workers.get(path)
+        if worker is None:
+            await self.start(path, fail_writes_default = False)
+            return
+        try:
+            config = await self._load_config(path, None, fail_writes_default = False)
+            self._check_output_format(path, config)
+            old = worker.core.config
+            await worker.core.update_config(config)
+        except Exception as e:
+            logger.error(f"Failed to reload config {path}: {e}")
+            return
+        if config.schedule != old.schedule or config.server.key != old.server.key:
+            worker.planner = self._planner(config)
+            if worker.job_id in self._scheduler:
+                self._scheduler.reschedule(worker.job_id, worker.planner.next_time())
+        logger.info(f"Worker {path.stem} reloaded")
+
+    async def close(self):
+        for path in list(self._workers):
+            await self.stop(path)
@@ -0,0 +1,25 @@
+import asyncio
+import yaml
+from typing import Any
+
+# 优先使用 libyaml 的 C 实现，未编译 libyaml 时回退到纯 Python 实现
+HAS_LIBYAML: bool = getattr(yaml, "__with_libyaml__", False)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# 超过该大小（字符数）的数据在线程池中序列化，避免阻塞事件循环
+OFFLOAD_THRESHOLD: int = 64 * 1024
+
+def dump(data: Any, **kwargs) -> str:
+    return yaml.dump(data, Dumper = SafeDumper, **kwargs)
+
+def load(text: str | bytes) -> Any:
+    return yaml.load(text, Loader = SafeLoader)
+
+async def load_async(text: str | bytes) -> Any:
+    """
+    `load` that runs in a worker thread for payloads larger than `OFFLOAD_THRESHOLD`.
+    """
+    if len(text) > OFFLOAD_THRESHOLD:
+        return await asyncio.to_thread(load, text)
+    return load(text)
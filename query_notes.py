@@ -0,0 +1,50 @@
+"""
+Search notes saved with the `sqlite` storage backend.
+
+    python query_notes.py ./output/notes.db --text "keyword" --since 2025-01-01 --user 10001
+"""
+import sys
+import argparse
+import orjson
+from pathlib import Path
+from note_core._sqlite_store import connect, search
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", type = Path, help = "SQLite database file")
+    parser.add_argument("-t", "--text", help = "Full-text query over CoT and Answer (FTS5 syntax)")
+    parser.add_argument("--since", help = "Earliest time, e.g. 2025-01-01 or '2025-01-01 08:00:00'")
+    parser.add_argument("--until", help = "Latest time (exclusive)")
+    parser.add_argument("-u", "--user", help = "Reference context user ID")
+    parser.add_argument("-n", "--limit", type = int, default = 20)
+    parser.add_argument("--json", action = "store_true", help = "Print matching notes as JSON lines")
+    args = parser.parse_args()
+
+    if not args.database.exists():
+        print(f"Database not found: {args.database}", file = sys.stderr)
+        return 1
+
+    conn = connect(args.database)
+    try:
+        notes = search(
+            conn,
+            text = args.text,
+            since = args.since,
+            until = args.until,
+            reference_user_id = args.user,
+            limit = args.limit,
+        )
+    finally:
+        conn.close()
+
+    for note in notes:
+        if args.json:
+            sys.stdout.buffer.write(orjson.dumps(note, option = orjson.OPT_APPEND_NEWLINE))
+            continue
+        answer = " ".join(note["answer"].split())
+        print(f"[{note['time']}] {note['note_id']} (model: {note['model_id']}, user: {note['reference_user_id']})")
+        print(f"    {answer[:120]}{'...' if len(answer) > 120 else ''}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
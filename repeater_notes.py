@@ -1,11 +1,21 @@
-import os
 import sys
 import asyncio
-from note_core import NoteCore, ConfigLoader
+from note_core import (
+    ConfigLoader,
+    RuntimeConfig,
+    Scheduler,
+    ScheduleState,
+    StartupRamp,
+    WorkerManager,
+    ConfigWatcher,
+    ConfigCache,
+    load_profiles,
+    segment_logs,
+    sqlite_stores,
+    note_writer,
+    Archiver,
+)
 from loguru import logger
-from pathlib import Path
-from itertools import chain
-from typing import Coroutine, Generator
 
 logger.remove()
 logger.add(
@@ -23,44 +33,77 @@ logger.add(
     delay=True,
 )
 
-def find_config_file(base_path: str | os.PathLike) -> Generator[Path, None, None]:
-    if not Path(base_path).is_dir():
-        raise NotADirectoryError(f"{base_path} is not a directory")
-    combined = chain(
-        Path(base_path).rglob('*.yaml'),
-        Path(base_path).rglob('*.yml'),
-        Path(base_path).rglob('*.json')
-    )
-    for file in combined:
-        if file.is_file() and not file.name.startswith("#"):
-            yield file
-
-async def run_timer_loop(path: Path):
-    logger.info(f"Worker {path.stem} is running")
-    loader = ConfigLoader(path)
-    config = await loader.load()
-    async with NoteCore(config) as core:
-        await core.load_prompt()
-        await core.timer_loop()
-
 async def main():
+    manager: WorkerManager | None = None
+    state: ScheduleState | None = None
+    tasks: list[asyncio.Task] = []
     try:
-        config_file: Generator[Path, None, None] = find_config_file("./config")
-        pool: set[Coroutine] = set()
-        for file in config_file:
-            pool.add(
-                asyncio.create_task(
-                    run_timer_loop(file)
-                )
-            )
+        runtime: RuntimeConfig = await ConfigLoader("./runtime.json", RuntimeConfig).load()
+        state = ScheduleState(runtime.state_file)
+        await state.load()
+        await load_profiles.load(runtime.load_profile_file)
+        note_writer.configure(
+            max_queue = runtime.writer.max_queue,
+            batch_size = runtime.writer.batch_size,
+            fsync = runtime.writer.fsync,
+        )
+        scheduler = Scheduler(max_workers = runtime.scheduler.max_workers, state = state)
+        ramp = StartupRamp(
+            window = runtime.startup.first_run_window,
+            max_starting = runtime.startup.max_starting,
+        )
+        config_cache = ConfigCache(runtime.config_cache_file)
+        await config_cache.load()
+        manager = WorkerManager(scheduler, ramp, config_cache = config_cache)
+        watcher = ConfigWatcher(
+            runtime.config_dir,
+            manager,
+            interval = runtime.watch.interval,
+            config_cache = config_cache,
+        )
+        await watcher.snapshot()
+        config_cache.prune(set(watcher.known))
+
+        tasks.append(asyncio.create_task(scheduler.run()))
+        results = await asyncio.gather(
+            *(manager.start(file, stat) for file, stat in watcher.known.items()),
+            return_exceptions = True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.opt(exception = result).error("Failed to start worker: {error}", error = result)
+        await config_cache.save()
         
-        await asyncio.gather(*pool)
+        if runtime.watch.enabled:
+            tasks.append(asyncio.create_task(watcher.run()))
+        if runtime.archive.enabled:
+            archiver = Archiver(
+                after_days = runtime.archive.after_days,
+                compression = runtime.archive.compression,
+                retention_days = runtime.archive.retention_days,
+                max_bytes = runtime.archive.max_bytes,
+                interval = runtime.archive.interval,
+            )
+            tasks.append(asyncio.create_task(archiver.run(lambda: manager.output_dirs)))
+        await asyncio.gather(*tasks)
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received. Exiting...")
         for task in asyncio.all_tasks():
             task.cancel()
     except Exception as e:
         logger.exception("An error occurred: {error}", error = e)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+        if manager is not None:
+            await manager.close()
+        await note_writer.close()
+        segment_logs.close()
+        sqlite_stores.close()
+        if state is not None:
+            await state.flush()
+            await load_profiles.flush()
         
 
 if __name__ == "__main__":